@@ -0,0 +1,90 @@
+"""Microbenchmark for Entity attribute access on a 10k-planet universe.
+
+Compares the generated per-type entity classes against the original dict-backed
+Entity, which scanned every component and field on each attribute access.
+
+    $ python -m benchmarks.entity_access
+"""
+import functools
+import random
+import timeit
+
+from universe import components, engine, exceptions
+
+
+PLANETS = 10_000
+
+
+class LinearEntity:
+    def __init__(self, manager, **kwargs):
+        self.__dict__.update(kwargs)
+        self._components = manager._entity_registry[kwargs['type']]
+
+    def __getattr__(self, name):
+        for component in self.__dict__.get('_components', {}).values():
+            for field in component._fields.values():
+                if name == field.data_name:
+                    return self.__dict__.get(name)
+                if name == field.name:
+                    return field.from_data(self.__dict__)
+        try:
+            return self.__dict__[name]
+        except KeyError:
+            raise AttributeError(f"{self.__class__.__name__!r} object has no attribute {name!r}")
+
+    def __setattr__(self, name, value):
+        for component in self.__dict__.get('_components', {}).values():
+            for field in component._fields.values():
+                if name in (field.data_name, field.name):
+                    try:
+                        self.__dict__[field.data_name] = field.to_data(value)
+                    except exceptions.empty:
+                        self.__dict__.pop(field.data_name, None)
+                    return
+        self.__dict__[name] = value
+
+
+def build(entity_cls):
+    manager = engine.Manager()
+    manager.register_entity_type('planet', [
+        components.PositionComponent(),
+        components.EnvironmentComponent(),
+        components.MineralConcentrationComponent(),
+        components.MineralInventoryComponent(),
+        components.PlanetaryFacilitiesComponent(),
+        components.OwnershipComponent(),
+        components.PopulationComponent(),
+    ])
+    engine.Entity.register_manager(manager)
+    if entity_cls is LinearEntity:
+        entity_cls = functools.partial(LinearEntity, manager)
+
+    random.seed(0)
+    planets = []
+    for pk in range(PLANETS):
+        data = {'pk': pk, 'type': 'planet', 'x': random.randint(0, 999), 'y': random.randint(0, 999),
+                'population': random.randint(0, 1_000_000)}
+        data.update(components.EnvironmentComponent.random())
+        data.update(components.MineralConcentrationComponent.random())
+        planets.append(entity_cls(**data))
+    return manager, planets
+
+
+def turn(planets):
+    # Touch the attributes the systems use most heavily, the way the systems do.
+    for entity in planets:
+        entity.x_prev, entity.y_prev = entity.x, entity.y
+        entity.dx = entity.warp or 0
+        entity.population = (entity.population or 0) + 1
+        entity.owner_id
+
+
+def main():
+    for label, entity_cls in (('linear scan', LinearEntity), ('generated', engine.Entity)):
+        manager, planets = build(entity_cls)
+        best = min(timeit.repeat(lambda: turn(planets), number=1, repeat=5))
+        print(f"{label:>12}: {best * 1000:8.1f} ms per pass over {PLANETS} planets")
+
+
+if __name__ == '__main__':
+    main()
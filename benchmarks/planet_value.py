@@ -0,0 +1,79 @@
+"""Benchmark of per-turn habitability evaluation in a 50-species, 20k-planet galaxy.
+
+Every owned planet is evaluated for its owner once per turn, as PopulationGrowthSystem does,
+with and without the planet_value cache, and with the per-species habitability tables.
+
+    $ python -m benchmarks.planet_value
+"""
+import random
+import timeit
+
+from universe import components, engine, utils
+
+
+SPECIES = 50
+PLANETS = 20_000
+TURNS = 5
+
+
+def random_species():
+    data = {'type': 'species'}
+    for env in utils.ENVIRONMENTS:
+        data[f'{env}_immune'] = random.random() < 0.1
+        if not data[f'{env}_immune']:
+            low = random.randint(0, 70)
+            data[f'{env}_min'], data[f'{env}_max'] = low, random.randint(low + 10, 100)
+    return data
+
+
+def build():
+    manager = engine.Manager(width=1000)
+    manager.register_entity_type('species', [
+        components.SpeciesEnvironmentComponent(),
+    ])
+    manager.register_entity_type('planet', [
+        components.EnvironmentComponent(),
+        components.OwnershipComponent(),
+    ])
+
+    random.seed(0)
+    species = [manager.register_entity(random_species()) for _ in range(SPECIES)]
+    for _ in range(PLANETS):
+        manager.register_entity(dict(type='planet', owner_id=random.choice(species).pk,
+                                     **components.EnvironmentComponent.random()))
+    return manager
+
+
+def turn(manager, planet_value):
+    for planet in manager.get_entities('ownership').values():
+        planet_value(planet.owner, planet)
+
+
+def table_turn(manager):
+    # The table of each species is looked up once for all of its planets, as in PopulationGrowthSystem.
+    for species in manager.get_entities('species_environment').values():
+        table = manager.get_habitability_table(species)
+        for planet in manager.get_owned_entities(species.pk, 'environment').values():
+            table.planet_value(planet)
+
+
+def main():
+    manager = build()
+    engine.Entity.register_manager(manager)
+
+    uncached = timeit.timeit(lambda: turn(manager, utils.planet_value), number=TURNS) / TURNS
+    print(f"   uncached: {uncached * 1000:8.1f} ms per turn")
+
+    utils.cached_planet_value.cache_clear()
+    first = timeit.timeit(lambda: turn(manager, utils.cached_planet_value), number=1)
+    cached = timeit.timeit(lambda: turn(manager, utils.cached_planet_value), number=TURNS) / TURNS
+    print(f" first turn: {first * 1000:8.1f} ms")
+    print(f"     cached: {cached * 1000:8.1f} ms per turn ({1 - cached / uncached:.0%} saved)")
+    print(f"            {utils.cached_planet_value.cache_info()}")
+
+    tables = timeit.timeit(lambda: table_turn(manager), number=TURNS) / TURNS
+    print(f"     tables: {tables * 1000:8.1f} ms per turn ({1 - tables / uncached:.0%} saved)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,75 @@
+"""Benchmark of the slot and column storage backends on a 100k-planet universe.
+
+Compares the memory held once the state has been streamed in, and the time taken to read the
+population of every planet through attributes, Manager.iter_values and Manager.get_arrays.
+
+    $ python -m benchmarks.storage
+"""
+import gc
+import io
+import json
+import random
+import timeit
+import tracemalloc
+
+from universe import components, engine, persistence
+
+
+PLANETS = 100_000
+
+
+def state():
+    random.seed(0)
+    species = {'pk': 0, 'type': 'species', 'name': 'Human', 'plural_name': 'Humans', 'growth_rate': 15,
+               'gravity_immune': True, 'temperature_immune': True, 'radiation_immune': True,
+               'population_per_r': 1000, 'factories_produce_r': 10, 'factories_cost_r': 10,
+               'factories_per_pop': 10, 'factories_cost_less': False, 'minerals_per_m': 10,
+               'mines_cost_r': 5, 'mines_per_pop': 10}
+    planets = []
+    for pk in range(1, PLANETS + 1):
+        planet = {'pk': pk, 'type': 'planet', 'x': random.randint(0, 9999), 'y': random.randint(0, 9999),
+                  'owner_id': 0, 'population': random.randint(1000, 1_000_000), 'mines': random.randint(0, 500),
+                  'ironium': random.randint(0, 5000), 'boranium': random.randint(0, 5000),
+                  'germanium': random.randint(0, 5000)}
+        planet.update(components.EnvironmentComponent.random())
+        planet.update(components.MineralConcentrationComponent.random())
+        planets.append(planet)
+    return {'turn': 2500, 'width': 10_000, 'seq': PLANETS + 1, 'entities': [species] + planets}
+
+
+def attributes(manager):
+    return sum(planet.population for planet in manager.get_entities('population').values())
+
+
+def iter_values(manager):
+    return sum(value for pk, value in manager.iter_values('population', 'population'))
+
+
+def arrays(manager):
+    return int(manager.get_arrays('population', 'population')[1].sum())
+
+
+def measure(text, columnar):
+    gc.collect()
+    tracemalloc.start()
+    game = engine.GameState(persistence.load_state(io.StringIO(text)), {}, columnar=columnar)
+    gc.collect()
+    memory = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    timings = {scan.__name__: min(timeit.repeat(lambda: scan(game.manager), number=1, repeat=5))
+               for scan in (attributes, iter_values, arrays)}
+    return memory, timings
+
+
+def main():
+    text = json.dumps(state())
+    for label, columnar in (('slots', False), ('columns', True)):
+        memory, timings = measure(text, columnar)
+        print(f"{label:>8}: {memory / 2 ** 20:6.1f} MiB for {PLANETS} planets")
+        for name, best in timings.items():
+            print(f"          {name:>11}: {best * 1000:6.1f} ms to sum their population")
+
+
+if __name__ == '__main__':
+    main()
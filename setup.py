@@ -9,6 +9,12 @@ setuptools.setup(
     description='A space 4X game',
     url='https://github.com/jbradberry/universe',
     packages=setuptools.find_packages(),
+    extras_require={
+        'vectorized': ['numpy'],
+    },
+    entry_points={
+        'console_scripts': ['universe = universe.runner:main'],
+    },
     classifiers=[
         'Development Status :: 1 - Planning',
         'License :: OSI Approved :: MIT License',
@@ -1,4 +1,5 @@
 # -*- coding: utf-8 -*-
+import random
 import unittest
 
 from universe import components, fields, engine, exceptions
@@ -49,6 +50,68 @@ class ComponentTestCase(unittest.TestCase):
         self.assertEqual(str(e.exception), "Only one of 'foo' or 'bar' can be set.")
 
 
+class EvenField(fields.IntField):
+    def validate(self, data):
+        super().validate(data)
+        if data.get(self.data_name, 0) % 2:
+            raise exceptions.ValidationError(f"{self.data_name!r} must be even.")
+
+
+class CompiledValidatorTestCase(unittest.TestCase):
+    def setUp(self):
+        self.manager = engine.Manager()
+        engine.Entity.register_manager(self.manager)
+
+    class HookedComponent(components.Component):
+        count = EvenField(min=0, max=10)
+        label = fields.CharField(required=False)
+
+        @staticmethod
+        def validate_count(data):
+            if data['count'] == 4:
+                raise exceptions.ValidationError("'count' may not be 4.")
+
+    def field_loop(self, component, data):
+        # The validation loop compiled validators replace.
+        for name, field in component._fields.items():
+            field.validate(data)
+            if hasattr(component, f'validate_{name}'):
+                getattr(component, f'validate_{name}')(data)
+
+    def outcome(self, validate, data):
+        try:
+            validate(data)
+        except exceptions.ValidationError as e:
+            return str(e)
+
+    def test_fallback_and_hooks(self):
+        component = self.HookedComponent()
+        self.assertIsNone(component.validate({'count': 2}))
+        self.assertEqual(self.outcome(component.validate, {'count': 3}), "'count' must be even.")
+        self.assertEqual(self.outcome(component.validate, {'count': 4}), "'count' may not be 4.")
+        self.assertEqual(self.outcome(component.validate, {'count': 12}),
+                         "'count' must be less than or equal to 10.")
+        self.assertEqual(self.outcome(component.validate, {'count': 2, 'label': 5}), "'label' must be a string.")
+
+    def test_same_errors(self):
+        values = [None, True, False, -1, 0, 3, 5, 50, 100, 101, 700, 'a', 1.5]
+        classes = [cls for cls in vars(components).values()
+                   if isinstance(cls, type) and issubclass(cls, components.Component)
+                   and cls not in (components.Component, components.MovementComponent)]
+        classes.append(self.HookedComponent)
+
+        rng = random.Random(0)
+        for cls in classes:
+            component = cls()
+            names = [field.data_name for field in cls._fields.values()]
+            for _ in range(200):
+                data = {name: rng.choice(values) for name in names if rng.random() < 0.8}
+                data = {name: value for name, value in data.items() if value is not None}
+                self.assertEqual(self.outcome(component._validate_fields, data),
+                                 self.outcome(lambda data: self.field_loop(component, data), data),
+                                 (cls.__name__, data))
+
+
 class MetadataComponentTestCase(unittest.TestCase):
     def setUp(self):
         self.manager = engine.Manager()
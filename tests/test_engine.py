@@ -1,9 +1,143 @@
 import unittest
 
-from universe import engine, exceptions
+from universe import components, engine, exceptions
 
 
 class EntityTestCase(unittest.TestCase):
+    def test_field_table(self):
+        manager = engine.Manager()
+        manager.register_entity_type('planet', [
+            components.PositionComponent(),
+            components.OwnershipComponent(),
+        ])
+
+        table = manager.get_field_table('planet')
+        self.assertIs(table['x'], components.PositionComponent._fields['x'])
+        self.assertIs(table['owner'], components.OwnershipComponent._fields['owner'])
+        self.assertIs(table['owner_id'], components.OwnershipComponent._fields['owner'])
+        self.assertIs(table['pk'], components.MetadataComponent._fields['pk'])
+        self.assertNotIn('gravity', table)
+
+    def test_attribute_access(self):
+        manager = engine.Manager()
+        manager.register_entity_type('species', [])
+        manager.register_entity_type('planet', [
+            components.PositionComponent(),
+            components.OwnershipComponent(),
+        ])
+        engine.Entity.register_manager(manager)
+
+        species = manager.register_entity({'type': 'species'})
+        planet = manager.register_entity({'type': 'planet', 'x': 300, 'y': 600})
+
+        self.assertIsNone(planet.warp)
+        self.assertIsNone(planet.owner)
+        self.assertIsNone(planet.owner_id)
+        with self.assertRaises(AttributeError):
+            planet.gravity
+
+        planet.owner = species
+        self.assertEqual(planet.owner_id, species.pk)
+        self.assertIs(planet.owner, species)
+
+        planet.owner = None
+        self.assertNotIn('owner_id', planet.serialize())
+
+        planet.warp = 5
+        del planet.warp
+        self.assertIsNone(planet.warp)
+        self.assertEqual(planet.serialize(), {'pk': planet.pk, 'type': 'planet', 'x': 300, 'y': 600})
+
+    def test_entity_class(self):
+        manager = engine.Manager()
+        manager.register_entity_type('ship', [
+            components.PositionComponent(),
+            components.OwnershipComponent(),
+        ])
+        engine.Entity.register_manager(manager)
+
+        ship = engine.Entity(type='ship', x=480, y=235)
+
+        self.assertIs(type(ship), manager.get_entity_class('ship'))
+        self.assertEqual(type(ship).__name__, 'ShipEntity')
+        self.assertIsInstance(ship, engine.Entity)
+        self.assertEqual(
+            set(type(ship).__slots__),
+            {'x', 'y', 'warp', 'x_prev', 'y_prev', 'owner_id', 'pk', 'type'}
+        )
+        self.assertEqual(ship.__dict__, {})
+        self.assertIsNone(ship.pk)
+        self.assertIsNone(ship.owner_id)
+
+        ship.dx = 5
+        self.assertEqual(ship.dx, 5)
+        self.assertEqual(ship.__dict__, {'dx': 5})
+
+        ship.pk = 2
+        self.assertEqual(ship.serialize(), {'pk': 2, 'type': 'ship', 'x': 480, 'y': 235})
+
+    def test_dirty_tracking(self):
+        manager = engine.Manager()
+        manager.register_entity_type('species', [components.SpeciesComponent()])
+        manager.register_entity_type('ship', [
+            components.PositionComponent(),
+            components.OwnershipComponent(),
+        ])
+        engine.Entity.register_manager(manager)
+
+        species = manager.register_entity({'type': 'species', 'name': 'Human', 'plural_name': 'Humans',
+                                           'growth_rate': 15})
+        ship = manager.register_entity({'type': 'ship', 'x': 480, 'y': 235})
+        self.assertEqual(ship.dirty_components(), ['position', 'ownership', 'metadata'])
+
+        manager.validate_entities()
+        self.assertEqual(ship.dirty_components(), [])
+
+        ship.dx = 5
+        ship.x = 480
+        self.assertEqual(ship.dirty_components(), [])
+        ship.owner = species
+        self.assertEqual(ship.dirty_components(), ['ownership'])
+        ship.x += 1
+        del ship.owner_id
+        self.assertEqual(ship.dirty_components(), ['position', 'ownership'])
+
+        ship.serialize()
+        self.assertEqual(ship.dirty_components(), [])
+
+    def test_export_revalidation(self):
+        manager = engine.Manager()
+        manager.register_entity_type('species', [components.SpeciesComponent()])
+        manager.register_entity_type('ship', [
+            components.PositionComponent(),
+            components.OwnershipComponent(),
+        ])
+        engine.Entity.register_manager(manager)
+        manager.import_data({'entities': [
+            {'pk': 0, 'type': 'species', 'name': 'Human', 'plural_name': 'Humans', 'growth_rate': 15},
+            {'pk': 1, 'type': 'ship', 'x': 480, 'y': 235, 'owner_id': 0},
+        ]}, {})
+        ship = manager.get_entity('metadata', 1)
+
+        # Changes made behind the back of the entity go unnoticed, except in strict mode.
+        ship._slots['warp'].__set__(ship, 'fast')
+        self.assertEqual(manager.export_data()['entities'][1]['warp'], 'fast')
+        manager.strict = True
+        with self.assertRaises(exceptions.ValidationError):
+            manager.export_data()
+        manager.strict = False
+
+        ship.warp = 'faster'
+        with self.assertRaises(exceptions.ValidationError):
+            manager.export_data()
+        ship.warp = 8
+
+        # Entities pointing at a removed entity are validated again.
+        manager.unregister_entity(manager.get_entity('metadata', 0))
+        with self.assertRaises(exceptions.ValidationError) as e:
+            manager.export_data()
+        self.assertEqual(str(e.exception), "'owner_id' is not an existing entity.")
+
     def test_invalid_ownership(self):
         state = {
             'turn': 2500, 'width': 1000, 'seq': 2,
@@ -33,6 +167,40 @@ class EntityTestCase(unittest.TestCase):
 
         self.assertEqual(str(e.exception), "'owner_id' is not an existing entity.")
 
+    def test_all_errors_reported(self):
+        state = {
+            'turn': 2500, 'width': 1000, 'seq': 7,
+            'entities': [
+                {'pk': 0, 'type': 'ship', 'x': 480, 'y': 235, 'owner_id': 4},
+                {'pk': 1, 'type': 'ship', 'x': 'far', 'y': 235, 'owner_id': 2},
+                {'pk': 2, 'type': 'planet', 'x': 300, 'y': 600, 'gravity': 27, 'temperature': 36,
+                 'radiation': 45, 'ironium_conc': 67, 'boranium_conc': 78, 'germanium_conc': 82},
+                {'pk': 3, 'type': 'movement_order', 'actor_id': 2, 'seq': 0, 'warp': 5, 'target_id': 0},
+                {'pk': 4, 'type': 'species', 'name': 'Human', 'plural_name': 'Humans', 'growth_rate': 15,
+                 'gravity_immune': True, 'temperature_immune': True, 'radiation_immune': True,
+                 'population_per_r': 1000, 'factories_produce_r': 10, 'factories_cost_r': 10,
+                 'factories_per_pop': 10, 'factories_cost_less': False, 'minerals_per_m': 10,
+                 'mines_cost_r': 5, 'mines_per_pop': 10},
+                # The movement orders are validated on their own once their actor is found to be invalid.
+                {'pk': 5, 'type': 'movement_order', 'seq': 0, 'warp': 5, 'x_t': 100},
+                {'pk': 6, 'type': 'movement_order', 'actor_id': [0], 'seq': 0, 'warp': 5, 'target_id': 2},
+            ]
+        }
+
+        with self.assertRaises(exceptions.BulkValidationError) as e:
+            engine.GameState(state, {})
+
+        self.assertEqual(
+            [(pk, str(error)) for pk, error in e.exception.errors],
+            [(1, "'x' must be an integer."),
+             (1, "'owner_id' cannot point to an entity of this type."),
+             (3, "The acting object must be a ship."),
+             (5, "'actor_id' is required."),
+             (5, "Either of 'target_id' or the target coordinates must be set."),
+             (6, "'actor_id' must be an integer.")]
+        )
+        self.assertTrue(str(e.exception).startswith("6 validation errors:"))
+
 
 class PersistenceTestCase(unittest.TestCase):
     def test_empty_universe(self):
@@ -206,6 +374,136 @@ class PersistenceTestCase(unittest.TestCase):
         self.assertEqual(species['mines_per_pop'], 10)
 
 
+class UpdateFilteringTestCase(unittest.TestCase):
+    def state(self, species_count):
+        entities = []
+        for pk in range(species_count):
+            entities.append({
+                'pk': pk, 'type': 'species', 'name': 'Human', 'plural_name': 'Humans', 'growth_rate': 15,
+                'gravity_immune': True, 'temperature_immune': True, 'radiation_immune': True,
+                'population_per_r': 1000, 'factories_produce_r': 10, 'factories_cost_r': 10,
+                'factories_per_pop': 10, 'factories_cost_less': False, 'minerals_per_m': 10,
+                'mines_cost_r': 5, 'mines_per_pop': 10,
+            })
+        for owner_id in range(species_count):
+            entities.append({'pk': len(entities), 'type': 'ship', 'x': 480, 'y': 235, 'owner_id': owner_id})
+        entities.append({'pk': len(entities), 'type': 'ship', 'x': 480, 'y': 235})
+        return {'turn': 2500, 'width': 1000, 'seq': len(entities), 'entities': entities}
+
+    def test_rejected(self):
+        updates = {
+            0: [
+                {'action': 'delete', 'actor_id': 2, 'seq': 0},
+                {'action': 'delete', 'actor_id': 3, 'seq': 0},
+                {'action': 'delete', 'actor_id': 4, 'seq': 0},
+                {'action': 'delete', 'actor_id': 10, 'seq': 0},
+                {'action': 'delete', 'actor_id': 0, 'seq': 0},
+                {'action': 'launch', 'actor_id': 2},
+                {'action': 'reorder', 'actor_id': 2, 'seq1': 0},
+                {'action': 'create', 'actor_id': 2, 'seq': 1, 'warp': 5, 'x_t': 0, 'y_t': 0},
+                {'action': 'create', 'type': 'ship', 'actor_id': 2, 'seq': 1},
+                {'action': 'create', 'type': ['movement_order'], 'actor_id': 2, 'seq': 1},
+            ],
+            5: [{'action': 'delete', 'actor_id': 2, 'seq': 0}],
+        }
+
+        with self.assertLogs('universe.engine', 'WARNING') as logs:
+            S = engine.GameState(self.state(2), updates)
+
+        self.assertEqual(S.manager._updates, [updates[0][0]])
+        self.assertEqual(
+            [(species_id, reason) for species_id, item, reason in S.manager.rejected_updates],
+            [(0, "actor is not owned by the species."), (0, "actor is not owned by the species."),
+             (0, "actor does not exist."), (0, "actor is not owned by the species."), (0, "unknown action."),
+             (0, "missing 'seq2'."), (0, "missing 'type'."), (0, "type is not a type of order."),
+             (0, "type is not a type of order."), (5, "species does not exist.")]
+        )
+        self.assertEqual([item for species_id, item, reason in S.manager.rejected_updates][:2],
+                         updates[0][1:3])
+        self.assertEqual(len(logs.output), 10)
+
+    def test_merge_order(self):
+        state = self.state(16)
+        updates = {
+            species_id: [{'action': 'delete', 'actor_id': actor_id, 'seq': seq}
+                         for actor_id in range(16, 34) for seq in range(5)]
+            for species_id in reversed(range(18))
+        }
+
+        with self.assertLogs('universe.engine', 'WARNING'):
+            S = engine.GameState(state, updates)
+
+        # Each of the 16 species owns the ship 16 pks after it; species 16 and 17 do not exist.
+        def owned(species_id, item):
+            return species_id < 16 and item['actor_id'] == species_id + 16
+
+        # Each species keeps the order of its updates, and the species that of `updates`.
+        self.assertEqual(S.manager._updates, [item for species_id, items in updates.items() for item in items
+                                              if owned(species_id, item)])
+        self.assertEqual([(species_id, item) for species_id, item, reason in S.manager.rejected_updates],
+                         [(species_id, item) for species_id, items in updates.items() for item in items
+                          if not owned(species_id, item)])
+
+
+class IndependentManagersTestCase(unittest.TestCase):
+    def state(self, offset):
+        # The same pks in every state, with different targets and owners.
+        return {
+            'turn': 2500, 'width': 1000, 'seq': 5,
+            'entities': [
+                {'pk': 0, 'type': 'species', 'name': 'Human', 'plural_name': 'Humans', 'growth_rate': 15,
+                 'gravity_immune': True, 'temperature_immune': True, 'radiation_immune': True,
+                 'population_per_r': 1000, 'factories_produce_r': 10, 'factories_cost_r': 10,
+                 'factories_per_pop': 10, 'factories_cost_less': False, 'minerals_per_m': 10,
+                 'mines_cost_r': 5, 'mines_per_pop': 10},
+                {'pk': 1, 'type': 'ship', 'x': 100 + offset, 'y': 100, 'owner_id': 0},
+                {'pk': 2, 'type': 'planet', 'x': 300 + 7 * offset, 'y': 200 + offset, 'gravity': 50,
+                 'temperature': 50, 'radiation': 50, 'ironium_conc': 50, 'boranium_conc': 50,
+                 'germanium_conc': 50, 'owner_id': 0, 'population': 1000 * (offset + 1)},
+                {'pk': 3, 'type': 'ship', 'x': 900 - offset, 'y': 900},
+                {'pk': 4, 'type': 'movement_order', 'actor_id': 1, 'seq': 0, 'target_id': 2 if offset % 2 else 3,
+                 'warp': 1 + offset % 9},
+            ]
+        }
+
+    def test_interleaved(self):
+        expected = [engine.GameState(self.state(offset), {}).generate() for offset in range(2)]
+
+        first = engine.GameState(self.state(0), {})
+        second = engine.GameState(self.state(1), {})
+        self.assertIs(first.manager.get_entity('orders', 4).target, first.manager.get_entity('metadata', 3))
+        self.assertEqual([first.generate(), second.generate()], expected)
+
+    def test_threads(self):
+        import concurrent.futures
+
+        offsets = list(range(24))
+        expected = [engine.GameState(self.state(offset), {}).generate() for offset in offsets]
+
+        def generate(offset):
+            return engine.GameState(self.state(offset), {}).generate()
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=8) as executor:
+            self.assertEqual(list(executor.map(generate, offsets)), expected)
+
+    def test_registered_manager(self):
+        import concurrent.futures
+
+        first = engine.GameState(self.state(0), {})
+        second = engine.GameState(self.state(1), {})
+        self.assertEqual(engine.Entity.manager.get_entity('metadata', 1).x, 101)
+        self.assertEqual(first.manager.get_entity_class('ship').manager.get_entity('metadata', 1).x, 100)
+        self.assertIs(second.manager.get_entity('metadata', 1).manager.get_entity('metadata', 2),
+                      second.manager.get_entity('metadata', 2))
+
+        def unregistered():
+            with self.assertRaisesRegex(AttributeError, "No Manager has been registered"):
+                engine.Entity.manager
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=1) as executor:
+            executor.submit(unregistered).result()
+
+
 class MovementTestCase(unittest.TestCase):
     def test_one_stationary_object(self):
         state = {'turn': 2500, 'width': 1000, 'seq': 1,
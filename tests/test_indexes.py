@@ -0,0 +1,132 @@
+import random
+import unittest
+
+from universe import components, engine
+
+
+class OwnerIndexTestCase(unittest.TestCase):
+    def setUp(self):
+        self.manager = engine.Manager(width=1000)
+        self.manager.register_entity_type('species', [])
+        self.manager.register_entity_type('ship', [
+            components.PositionComponent(),
+            components.OwnershipComponent(),
+        ])
+        self.manager.register_entity_type('planet', [
+            components.OwnershipComponent(),
+            components.PopulationComponent(),
+        ])
+        engine.Entity.register_manager(self.manager)
+
+        rng = random.Random(0)
+        self.species = [self.manager.register_entity({'type': 'species'}) for _ in range(3)]
+        self.entities = []
+        for _ in range(200):
+            data = {'type': rng.choice(['ship', 'planet'])}
+            if rng.random() < 0.8:
+                data['owner_id'] = rng.choice(self.species).pk
+            self.entities.append(self.manager.register_entity(data))
+
+    def brute_force(self, owner_id, _type):
+        return {entity.pk: entity for entity in self.entities if _type in entity and entity.owner_id == owner_id}
+
+    def assertIndexed(self):
+        for species in self.species:
+            for _type in ('metadata', 'ownership', 'position', 'population'):
+                self.assertEqual(self.manager.get_owned_entities(species.pk, _type),
+                                 self.brute_force(species.pk, _type))
+
+    def test_owned_entities(self):
+        self.assertIndexed()
+        self.assertEqual(len(self.manager._ownership), len([e for e in self.entities if e.owner_id is not None]))
+        self.assertEqual(self.manager.get_owned_entities(1000, 'metadata'), {})
+        self.assertEqual(self.manager.get_owned_entities(self.species[0].pk, 'orders'), {})
+
+    def test_owner_changes(self):
+        rng = random.Random(1)
+        for entity in rng.sample(self.entities, 50):
+            entity.owner_id = rng.choice(self.species).pk
+        for entity in rng.sample(self.entities, 50):
+            entity.owner = rng.choice(self.species)
+        for entity in rng.sample(self.entities, 20):
+            if entity.owner_id is not None:
+                del entity.owner_id
+        for entity in rng.sample(self.entities, 20):
+            entity.owner = None
+        self.assertIndexed()
+
+    def test_unregister(self):
+        entity = next(entity for entity in self.entities if entity.owner_id is not None)
+        self.manager.unregister_entity(entity)
+        self.entities.remove(entity)
+        self.assertIndexed()
+
+    def test_unregistered_entities(self):
+        ship = engine.Entity(type='ship', owner_id=self.species[0].pk)
+        ship.owner_id = self.species[1].pk
+        self.assertNotIn(ship, self.manager._ownership)
+        self.assertIndexed()
+
+
+class OrderIndexTestCase(unittest.TestCase):
+    def setUp(self):
+        self.manager = engine.Manager(width=1000)
+        self.manager.register_entity_type('ship', [
+            components.PositionComponent(),
+        ])
+        self.manager.register_entity_type('movement_order', [
+            components.OrderComponent(),
+            components.MovementComponent(),
+        ])
+        engine.Entity.register_manager(self.manager)
+
+        rng = random.Random(0)
+        self.ships = [self.manager.register_entity({'type': 'ship', 'x': 0, 'y': 0}) for _ in range(5)]
+        self.orders = []
+        for seq in rng.sample(range(1000), 300):
+            self.orders.append(self.manager.register_entity(
+                {'type': 'movement_order', 'actor_id': rng.choice(self.ships).pk, 'seq': seq, 'warp': 5,
+                 'x_t': 10, 'y_t': 10}))
+
+    def brute_force(self, actor_id):
+        return sorted((order for order in self.orders if order.actor_id == actor_id and order.seq is not None),
+                      key=lambda order: order.seq)
+
+    def assertIndexed(self):
+        queues = {ship.pk: self.brute_force(ship.pk) for ship in self.ships}
+        self.assertEqual({pk: list(orders) for pk, orders in self.manager.iter_order_queues()},
+                         {pk: queue for pk, queue in queues.items() if queue})
+        for pk, queue in queues.items():
+            self.assertEqual(self.manager.get_orders(pk), queue)
+            for order in queue:
+                self.assertIs(self.manager.get_order(pk, order.seq), order)
+
+    def test_queues(self):
+        self.assertIndexed()
+        self.assertEqual(len(self.manager._orders), 300)
+        self.assertIsNone(self.manager.get_order(self.ships[0].pk, 1000))
+        self.assertIsNone(self.manager.get_order(self.ships[0].pk, 'first'))
+        self.assertEqual(self.manager.get_orders(1000), [])
+
+    def test_changes(self):
+        rng = random.Random(1)
+        for order in rng.sample(self.orders, 50):
+            order.seq = rng.randint(1000, 2000)
+        for order in rng.sample(self.orders, 50):
+            order.actor = rng.choice(self.ships)
+        for order in rng.sample(self.orders, 20):
+            self.manager.unregister_entity(order)
+            self.orders.remove(order)
+        self.assertIndexed()
+
+        for order in rng.sample(self.orders, 5):
+            del order.seq
+        self.assertIndexed()
+
+    def test_renumbering(self):
+        for ship in self.ships:
+            for i, order in enumerate(self.manager.get_orders(ship.pk)):
+                order.seq = i
+        self.assertIndexed()
+        self.assertEqual([order.seq for order in self.manager.get_orders(self.ships[0].pk)],
+                         list(range(len(self.brute_force(self.ships[0].pk)))))
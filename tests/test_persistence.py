@@ -0,0 +1,213 @@
+import copy
+import io
+import json
+import unittest
+
+from universe import components, engine, persistence
+
+
+STATE = {
+    'turn': 2500, 'width': 1000, 'seq': 3,
+    'entities': [
+        {'pk': 0, 'type': 'species', 'name': 'Human', 'plural_name': 'Humans', 'growth_rate': 15,
+         'gravity_immune': True, 'temperature_immune': True, 'radiation_immune': True,
+         'population_per_r': 1000, 'factories_produce_r': 10, 'factories_cost_r': 10,
+         'factories_per_pop': 10, 'factories_cost_less': False, 'minerals_per_m': 10,
+         'mines_cost_r': 5, 'mines_per_pop': 10},
+        {'pk': 1, 'type': 'planet', 'x': 300, 'y': 600, 'gravity': 27, 'temperature': 36, 'radiation': 45,
+         'ironium_conc': 67, 'boranium_conc': 78, 'germanium_conc': 82, 'ironium': 20, 'boranium': 30,
+         'germanium': 40, 'owner_id': 0, 'population': 1000},
+        {'pk': 2, 'type': 'ship', 'x': 480, 'y': 235, 'owner_id': 0, 'population': 1000},
+    ],
+}
+
+
+class CountingFile(io.StringIO):
+    """Records how much of the file has been read so far."""
+
+    def read(self, size=-1):
+        data = super().read(size)
+        self.consumed = self.tell()
+        return data
+
+
+class LoadStateTestCase(unittest.TestCase):
+    def test_chunk_sizes(self):
+        text = json.dumps(STATE, indent=2)
+        for chunk_size in (1, 2, 3, 7, 64, len(text)):
+            state = persistence.load_state(io.StringIO(text), chunk_size=chunk_size)
+            state['entities'] = list(state['entities'])
+            self.assertEqual(state, STATE)
+
+    def test_headers_after_entities(self):
+        text = json.dumps({'entities': STATE['entities'], 'turn': 2500, 'seq': 3})
+        state = persistence.load_state(io.StringIO(text), chunk_size=16)
+
+        self.assertEqual(list(state), ['entities'])
+        self.assertEqual(list(state['entities']), STATE['entities'])
+        self.assertEqual(state['turn'], 2500)
+        self.assertEqual(state['seq'], 3)
+
+    def test_numbers_across_chunks(self):
+        text = '{"entities": [12345, -1.5e3, 0.25, 2E+10, 3e-7, true, null, 9], "seq": 67890}'
+        for chunk_size in range(1, 8):
+            state = persistence.load_state(io.StringIO(text), chunk_size=chunk_size)
+            self.assertEqual(list(state['entities']), [12345, -1.5e3, 0.25, 2E+10, 3e-7, True, None, 9])
+            self.assertEqual(state['seq'], 67890)
+
+    def test_no_entities(self):
+        self.assertEqual(persistence.load_state(io.StringIO('{}')), {})
+        state = persistence.load_state(io.StringIO('{"turn": 1, "entities": []}'))
+        self.assertEqual(list(state['entities']), [])
+        self.assertEqual(state['turn'], 1)
+
+    def test_incremental(self):
+        fp = CountingFile(json.dumps(STATE))
+        state = persistence.load_state(fp, chunk_size=32)
+        entities = state['entities']
+
+        self.assertEqual(next(entities), STATE['entities'][0])
+        # Only the first entity, plus at most one chunk beyond it, has been read.
+        self.assertLessEqual(fp.consumed, len(fp.getvalue()) - len(json.dumps(STATE['entities'][1:])) + 32)
+        self.assertLess(fp.consumed, len(fp.getvalue()))
+
+    def test_malformed(self):
+        with self.assertRaises(json.JSONDecodeError):
+            list(persistence.load_state(io.StringIO('{"entities": [{"pk": 0} {"pk": 1}]}'))['entities'])
+        with self.assertRaises(json.JSONDecodeError):
+            list(persistence.load_state(io.StringIO('{"entities": [{"pk": 0}'))['entities'])
+
+    def test_lines(self):
+        headers = {key: value for key, value in STATE.items() if key != 'entities'}
+        text = '\n'.join(json.dumps(item) for item in [headers] + STATE['entities']) + '\n'
+        state = persistence.load_state_lines(io.StringIO(text))
+        state['entities'] = list(state['entities'])
+
+        self.assertEqual(state, STATE)
+
+    def test_game_state(self):
+        expected = engine.GameState(json.loads(json.dumps(STATE)), {}).generate()
+
+        with io.StringIO(json.dumps(STATE)) as fp:
+            results = engine.GameState(persistence.load_state(fp, chunk_size=64), {}).generate()
+        self.assertEqual(results, expected)
+
+    def test_registered_as_decoded(self):
+        manager = engine.Manager()
+        manager.register_entity_type('species', [components.SpeciesComponent()])
+        engine.Entity.register_manager(manager)
+
+        entities = ({'pk': pk, 'type': 'species', 'name': 'Human', 'plural_name': 'Humans', 'growth_rate': 15}
+                    for pk in range(3))
+
+        def stream():
+            for entity in entities:
+                self.assertEqual(len(manager.get_entities('metadata')), entity['pk'])
+                yield entity
+
+        manager.import_data({'entities': stream(), 'seq': 3}, {})
+        self.assertEqual(len(manager.get_entities('metadata')), 3)
+        self.assertEqual(manager._seq, 3)
+
+
+class DumpStateTestCase(unittest.TestCase):
+    def test_matches_json_dumps(self):
+        for state in ({}, {'turn': 1, 'entities': []}, {'entities': [{}], 'seq': 1}, STATE):
+            fp = io.StringIO()
+            streamed = {key: iter(value) if key == 'entities' else value for key, value in state.items()}
+            persistence.dump_state(streamed, fp)
+            self.assertEqual(fp.getvalue(), json.dumps(state))
+
+    def test_game_state(self):
+        expected = json.dumps(engine.GameState(json.loads(json.dumps(STATE)), {}).generate())
+
+        results = engine.GameState(json.loads(json.dumps(STATE)), {}).generate(stream=True)
+        self.assertNotIsInstance(results['entities'], list)
+        fp = io.StringIO()
+        persistence.dump_state(results, fp)
+        self.assertEqual(fp.getvalue(), expected)
+
+    def test_lines_round_trip(self):
+        fp = io.StringIO()
+        persistence.dump_state_lines(STATE, fp)
+        self.assertEqual(len(fp.getvalue().splitlines()), 1 + len(STATE['entities']))
+
+        fp.seek(0)
+        state = persistence.load_state_lines(fp)
+        state['entities'] = list(state['entities'])
+        self.assertEqual(state, STATE)
+
+
+class DeltaTestCase(unittest.TestCase):
+    def state(self):
+        state = copy.deepcopy(STATE)
+        state['seq'] = 6
+        state['entities'].extend([
+            {'pk': 3, 'type': 'planet', 'x': 700, 'y': 100, 'gravity': 50, 'temperature': 50, 'radiation': 50,
+             'ironium_conc': 10, 'boranium_conc': 20, 'germanium_conc': 30},
+            {'pk': 4, 'type': 'movement_order', 'actor_id': 2, 'seq': 0, 'x_t': 500, 'y_t': 300, 'warp': 6},
+            {'pk': 5, 'type': 'movement_order', 'actor_id': 2, 'seq': 1, 'target_id': 3, 'warp': 9},
+        ])
+        return state
+
+    def updates(self):
+        return {0: [
+            {'action': 'delete', 'actor_id': 2, 'seq': 1},
+            {'action': 'create', 'type': 'movement_order', 'actor_id': 2, 'seq': 2, 'target_id': 1, 'warp': 3},
+        ]}
+
+    def test_apply_delta(self):
+        expected = engine.GameState(self.state(), self.updates()).generate()
+
+        old = self.state()
+        delta = engine.GameState(copy.deepcopy(old), self.updates()).generate_delta()
+        self.assertEqual(persistence.apply_delta(old, delta), expected)
+        self.assertEqual(old, self.state())
+
+        self.assertEqual(delta['deleted'], [5])
+        self.assertEqual([entity['pk'] for entity in delta['created']], [6])
+        changes = {change['pk']: change for change in delta['changed']}
+        self.assertNotIn(0, changes)
+        self.assertEqual(set(changes[2]['set']), {'x', 'y', 'x_prev', 'y_prev'})
+        self.assertEqual(changes[2]['unset'], [])
+
+    def test_same_json(self):
+        # Starting from an exported state, the entities are rebuilt in the order of the export,
+        # e.g. with the mined minerals of the planet and the previous coordinates of the ship.
+        state = self.state()
+        state['entities'][1]['mines'] = 100
+        state['entities'][1]['population'] = 100_000
+        old = engine.GameState(state, {}).generate()
+        for name in ('ironium', 'boranium', 'germanium'):
+            del old['entities'][1][name]
+        del old['entities'][2]['x_prev'], old['entities'][2]['y_prev']
+        expected = engine.GameState(copy.deepcopy(old), self.updates()).generate()
+        delta = engine.GameState(copy.deepcopy(old), self.updates()).generate_delta()
+
+        changes = {change['pk']: change for change in delta['changed']}
+        self.assertNotIn('ironium', old['entities'][1])
+        self.assertIn('ironium', changes[1]['set'])
+        self.assertIn('x_prev', changes[2]['set'])
+        self.assertEqual(set(delta['fields']), {'planet', 'ship'})
+        self.assertEqual(json.dumps(persistence.apply_delta(old, delta)), json.dumps(expected))
+
+    def test_unset(self):
+        state = self.state()
+        state['entities'][1]['population'] = 0
+        expected = engine.GameState(copy.deepcopy(state), {}).generate()
+        delta = engine.GameState(copy.deepcopy(state), {}).generate_delta()
+
+        change = next(change for change in delta['changed'] if change['pk'] == 1)
+        self.assertEqual(change['unset'], ['owner_id', 'population'])
+        self.assertEqual(persistence.apply_delta(state, delta), expected)
+
+    def test_successive_deltas(self):
+        S = engine.GameState(self.state(), {})
+        S.manager.process()
+        first = S.manager.export_delta()
+        second = S.manager.export_delta()
+
+        self.assertTrue(first['changed'])
+        self.assertEqual(second['created'], [])
+        self.assertEqual(second['deleted'], [])
+        self.assertEqual(second['changed'], [])
@@ -0,0 +1,124 @@
+import contextlib
+import copy
+import io
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+from universe import engine, runner
+
+
+STATE = {
+    'turn': 2500, 'width': 1000, 'seq': 4,
+    'entities': [
+        {'pk': 0, 'type': 'species', 'name': 'Human', 'plural_name': 'Humans', 'growth_rate': 15,
+         'gravity_immune': True, 'temperature_immune': True, 'radiation_immune': True,
+         'population_per_r': 1000, 'factories_produce_r': 10, 'factories_cost_r': 10,
+         'factories_per_pop': 10, 'factories_cost_less': False, 'minerals_per_m': 10,
+         'mines_cost_r': 5, 'mines_per_pop': 10},
+        {'pk': 1, 'type': 'planet', 'x': 300, 'y': 600, 'gravity': 27, 'temperature': 36, 'radiation': 45,
+         'ironium_conc': 67, 'boranium_conc': 78, 'germanium_conc': 82, 'owner_id': 0, 'population': 1000},
+        {'pk': 2, 'type': 'ship', 'x': 480, 'y': 235, 'owner_id': 0},
+        {'pk': 3, 'type': 'movement_order', 'actor_id': 2, 'seq': 0, 'x_t': 500, 'y_t': 300, 'warp': 6},
+    ]
+}
+
+UPDATES = {0: [
+    {'action': 'create', 'type': 'movement_order', 'actor_id': 2, 'seq': 1, 'target_id': 1, 'warp': 3},
+    {'action': 'delete', 'actor_id': 9, 'seq': 0},
+]}
+
+
+class RunnerTestCase(unittest.TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root)
+
+        self.expected = {}
+        for i, name in enumerate(['alpha', 'beta', 'gamma']):
+            state = dict(copy.deepcopy(STATE), turn=2500 + i)
+            self.write(name, runner.STATE_FILE, state)
+            if name != 'beta':
+                self.write(name, runner.UPDATES_FILE, UPDATES)
+            self.expected[name] = engine.GameState(state, {} if name == 'beta' else copy.deepcopy(UPDATES)).generate()
+        self.write('broken', runner.STATE_FILE, {'turn': 1, 'width': 1000, 'entities': [{'pk': 0, 'type': 'ship'}]})
+        os.mkdir(os.path.join(self.root, 'empty'))
+
+    def write(self, game, filename, data):
+        os.makedirs(os.path.join(self.root, game), exist_ok=True)
+        with open(os.path.join(self.root, game, filename), 'w') as fp:
+            json.dump(data, fp)
+
+    def read(self, *path):
+        with open(os.path.join(*path)) as fp:
+            return json.load(fp)
+
+    def check(self, results, output):
+        self.assertEqual([result['game'] for result in results], ['alpha', 'beta', 'broken', 'gamma'])
+        for result in results:
+            self.assertGreater(result['seconds'], 0)
+            if result['game'] == 'broken':
+                self.assertTrue(result['error'].startswith('BulkValidationError'))
+                continue
+            self.assertIsNone(result['error'])
+            self.assertEqual(result['turn'], self.expected[result['game']]['turn'])
+            self.assertEqual(result['rejected'], 1 if result['game'] != 'beta' else 0)
+            self.assertEqual(self.read(output, result['game'], runner.STATE_FILE), self.expected[result['game']])
+
+        self.assertEqual(self.read(self.root, 'broken', runner.STATE_FILE)['turn'], 1)
+        # Applied updates are set aside in place, and left alone otherwise.
+        applied = runner.APPLIED_UPDATES_FILE.format(turn=2500)
+        self.assertEqual(sorted(os.listdir(os.path.join(output, 'alpha'))),
+                         sorted([runner.STATE_FILE] + ([applied] if output == self.root else [])))
+        self.assertEqual(sorted(os.listdir(os.path.join(self.root, 'alpha'))),
+                         sorted([runner.STATE_FILE, applied if output == self.root else runner.UPDATES_FILE]))
+
+    def test_find_games(self):
+        self.assertEqual([os.path.basename(path) for path in runner.find_games(self.root)],
+                         ['alpha', 'beta', 'broken', 'gamma'])
+
+    def test_in_place(self):
+        with self.assertLogs('universe', 'WARNING'):
+            results = runner.run_games(runner.find_games(self.root), workers=1)
+        self.check(results, self.root)
+
+    def test_process_pool(self):
+        output = os.path.join(self.root, 'next')
+        results = runner.run_games(runner.find_games(self.root), output, workers=2)
+        self.check(results, output)
+
+    def test_rerun(self):
+        paths = [os.path.join(self.root, 'alpha'), os.path.join(self.root, 'beta')]
+        runner.run_games(paths, workers=1)
+        results = runner.run_games(paths, workers=1)
+
+        self.assertEqual([(result['turn'], result['rejected']) for result in results], [(2502, 0), (2503, 0)])
+        self.assertEqual(self.read(self.root, 'alpha', runner.STATE_FILE),
+                         engine.GameState(self.expected['alpha'], {}).generate())
+
+    def test_permissions(self):
+        os.chmod(os.path.join(self.root, 'alpha', runner.STATE_FILE), 0o640)
+        output = os.path.join(self.root, 'next')
+        umask = os.umask(0o022)
+        try:
+            runner.run_games([os.path.join(self.root, 'alpha')], workers=1)
+            runner.run_games([os.path.join(self.root, 'beta')], output, workers=1)
+        finally:
+            os.umask(umask)
+
+        self.assertEqual(os.stat(os.path.join(self.root, 'alpha', runner.STATE_FILE)).st_mode & 0o777, 0o640)
+        self.assertEqual(os.stat(os.path.join(output, 'beta', runner.STATE_FILE)).st_mode & 0o777, 0o644)
+
+    def test_main(self):
+        stdout = io.StringIO()
+        with contextlib.redirect_stdout(stdout), self.assertLogs('universe', 'WARNING'):
+            status = runner.main([self.root, '-j', '1', '--fixed-point'])
+
+        self.assertEqual(status, 1)
+        lines = stdout.getvalue().splitlines()
+        self.assertEqual(len(lines), 5)
+        self.assertIn('turn 2501, 1 updates rejected', lines[0])
+        self.assertIn('failed: BulkValidationError', lines[2])
+        self.assertTrue(lines[4].startswith('3 of 4 games generated'))
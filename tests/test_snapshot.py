@@ -0,0 +1,160 @@
+import io
+import json
+import os
+import tempfile
+import unittest
+
+from universe import engine, snapshot
+
+
+SPECIES = {
+    'pk': 0, 'type': 'species', 'name': 'Human', 'plural_name': 'Humans', 'growth_rate': 15,
+    'gravity_immune': True, 'temperature_immune': False, 'radiation_immune': True,
+    'temperature_min': 20, 'temperature_max': 80,
+    'population_per_r': 1000, 'factories_produce_r': 10, 'factories_cost_r': 10,
+    'factories_per_pop': 10, 'factories_cost_less': False, 'minerals_per_m': 10,
+    'mines_cost_r': 5, 'mines_per_pop': 10,
+}
+
+STATE = {
+    'turn': 2500, 'width': 1000, 'seq': 6,
+    'entities': [
+        SPECIES,
+        {'pk': 1, 'type': 'planet', 'x': 300, 'y': 600, 'gravity': 27, 'temperature': 36, 'radiation': 45,
+         'ironium_conc': 67, 'boranium_conc': 78, 'germanium_conc': 82, 'ironium': 20, 'boranium': 30,
+         'germanium': 40, 'owner_id': 0, 'population': 1000},
+        {'pk': 2, 'type': 'ship', 'x': 480, 'y': 235, 'owner_id': 0, 'population': 1000},
+        {'pk': 3, 'type': 'planet', 'x': 700, 'y': 100, 'gravity': 50, 'temperature': 50, 'radiation': 50,
+         'ironium_conc': 10, 'boranium_conc': 20, 'germanium_conc': 30},
+        {'pk': 4, 'type': 'movement_order', 'actor_id': 2, 'seq': 0, 'x_t': 500, 'y_t': 300, 'warp': 6},
+        {'pk': 5, 'type': 'movement_order', 'actor_id': 2, 'seq': 1, 'target_id': 3, 'warp': 9},
+    ]
+}
+
+
+class SnapshotTestCase(unittest.TestCase):
+    def round_trip(self, state):
+        result = snapshot.loads(snapshot.dumps(state))
+        result['entities'] = list(result['entities'])
+        return result
+
+    def test_round_trip(self):
+        result = self.round_trip(STATE)
+
+        self.assertEqual(result, STATE)
+        self.assertEqual(json.dumps(result), json.dumps(STATE))
+
+    def test_values(self):
+        state = {
+            'turn': 1, 'name': 'Wōrld', 'ratio': 0.5, 'options': {'fast': [1, None]}, 'nothing': None,
+            'entities': [
+                {'type': 'thing', 'small': -128, 'medium': 40000, 'large': -2 ** 40, 'huge': 2 ** 70,
+                 'flag': False, 'label': 'ä', 'mixed': 1},
+                {'type': 'thing', 'small': 127, 'medium': -1, 'large': 2 ** 62, 'huge': -5,
+                 'flag': True, 'label': '', 'mixed': 'one'},
+                {'type': 'other'},
+                {'type': 'thing', 'huge': 0, 'mixed': 2.5},
+            ]
+        }
+        self.assertEqual(self.round_trip(state), state)
+
+    def test_empty(self):
+        self.assertEqual(self.round_trip({}), {'entities': []})
+        self.assertEqual(self.round_trip({'turn': 0, 'entities': []}), {'turn': 0, 'entities': []})
+
+    def test_field_order(self):
+        state = {'entities': [
+            {'type': 'thing', 'a': 1, 'c': 3},
+            {'type': 'thing', 'b': 2, 'c': 3},
+            {'type': 'thing', 'a': 1, 'b': 2, 'c': 3},
+        ]}
+        self.assertEqual(self.round_trip(state), state)
+        self.assertEqual([list(entity) for entity in self.round_trip(state)['entities']],
+                         [['type', 'a', 'c'], ['type', 'b', 'c'], ['type', 'a', 'b', 'c']])
+
+    def test_invalid(self):
+        data = snapshot.dumps(STATE)
+        with self.assertRaises(ValueError):
+            snapshot.loads(b'NOTASNAP' + data[8:])
+        with self.assertRaises(ValueError):
+            list(snapshot.loads(data[:len(data) // 2])['entities'])
+
+    def test_smaller_than_json(self):
+        planet = STATE['entities'][1]
+        state = dict(STATE, entities=[SPECIES] + [dict(planet, pk=pk) for pk in range(1, 1001)])
+        self.assertLess(len(snapshot.dumps(state)), len(json.dumps(state)) / 3)
+
+    def test_file(self):
+        fp = io.BytesIO()
+        snapshot.dump(STATE, fp)
+        fp.seek(0)
+        state = snapshot.load(fp)
+        state['entities'] = list(state['entities'])
+        self.assertEqual(state, STATE)
+
+    def test_load_manager(self):
+        expected = engine.GameState(json.loads(json.dumps(STATE)), {}).generate()
+
+        S = engine.GameState({'turn': 2500, 'width': 1000}, {})
+        headers = snapshot.load_manager(S.manager, snapshot.dumps(STATE))
+
+        self.assertEqual(headers, {'turn': 2500, 'width': 1000, 'seq': 6})
+        self.assertEqual(S.manager.export_data(), dict(seq=6, entities=STATE['entities']))
+        self.assertEqual(S.generate(), expected)
+
+
+class ArchiveTestCase(unittest.TestCase):
+    def setUp(self):
+        self.manager = engine.Manager()
+        engine.GameState.register_entity_types(self.manager)
+
+        fd, self.path = tempfile.mkstemp(suffix='.snap')
+        with os.fdopen(fd, 'wb') as fp:
+            snapshot.dump(STATE, fp)
+        self.addCleanup(os.remove, self.path)
+
+    def test_get_entities(self):
+        with snapshot.Archive.open(self.path, self.manager) as archive:
+            self.assertEqual(archive.headers, {'turn': 2500, 'width': 1000, 'seq': 6})
+            self.assertEqual(list(archive.get_entities('metadata')), [0, 1, 3, 2, 4, 5])
+            self.assertEqual(sorted(archive.get_entities('population')), [1, 2, 3])
+            self.assertEqual(len(archive.get_entities('movement_orders')), 2)
+            self.assertEqual(dict(archive.get_entities('species')), {0: archive.get_entity('metadata', 0)})
+            self.assertIsNone(archive.get_entity('ownership', 4))
+
+    def test_attribute_access(self):
+        with snapshot.Archive.open(self.path, self.manager) as archive:
+            planet = archive.get_entity('metadata', 1)
+            self.assertEqual((planet.pk, planet.type, planet.x, planet.population), (1, 'planet', 300, 1000))
+            self.assertIsNone(planet.warp)
+            self.assertIn('ownership', planet)
+            self.assertNotIn('orders', planet)
+            with self.assertRaises(AttributeError):
+                planet.growth_rate
+
+            species = planet.owner
+            self.assertEqual(planet.owner_id, 0)
+            self.assertEqual((species.name, species.gravity_immune, species.temperature_min), ('Human', True, 20))
+            self.assertIsNone(species.gravity_min)
+
+            unowned = archive.get_entity('metadata', 3)
+            self.assertIsNone(unowned.owner)
+            self.assertIsNone(unowned.population)
+
+            order = archive.get_entity('orders', 5)
+            self.assertEqual(order.target.x, 700)
+            self.assertEqual(order.actor, archive.get_entity('position', 2))
+
+    def test_iter_values(self):
+        with snapshot.Archive.open(self.path, self.manager) as archive:
+            self.assertEqual(dict(archive.iter_values('population', 'population')), {1: 1000, 2: 1000})
+            self.assertEqual(dict(archive.iter_values('species', 'name')), {0: 'Human'})
+            self.assertEqual(dict(archive.iter_values('movement_orders', 'target')), {5: 3})
+            self.assertEqual(dict(archive.iter_values('position', 'warp')), {})
+
+    def test_in_memory(self):
+        archive = snapshot.Archive(snapshot.dumps(STATE), self.manager)
+        for entity in STATE['entities']:
+            row = archive.get_entity('metadata', entity['pk'])
+            self.assertEqual({name: getattr(row, name) for name in entity}, entity)
+        archive.close()
@@ -0,0 +1,81 @@
+import random
+import unittest
+
+from universe import components, engine
+
+
+class GridIndexTestCase(unittest.TestCase):
+    def setUp(self):
+        self.manager = engine.Manager(width=1000)
+        self.manager.register_entity_type('ship', [
+            components.PositionComponent(),
+        ])
+        self.manager.register_entity_type('species', [])
+
+        rng = random.Random(0)
+        self.ships = [self.manager.register_entity({'type': 'ship', 'x': rng.randint(0, 999), 'y': rng.randint(0, 999)})
+                      for _ in range(500)]
+
+    def brute_force(self, predicate):
+        return {ship.pk: ship for ship in self.ships if predicate(ship)}
+
+    def test_only_positioned_entities(self):
+        self.manager.register_entity({'type': 'species'})
+        self.assertEqual(len(self.manager._spatial), 500)
+
+    def test_in_rect(self):
+        self.assertEqual(
+            self.manager.get_entities_in_rect(100, 250, 320, 300),
+            self.brute_force(lambda s: 100 <= s.x <= 320 and 250 <= s.y <= 300)
+        )
+        self.assertEqual(self.manager.get_entities_in_rect(-100, -100, 2000, 2000), self.brute_force(lambda s: True))
+
+    def test_in_radius(self):
+        for x, y, r in [(500, 500, 50), (0, 0, 120), (999, 10, 0), (333, 777, 1000)]:
+            self.assertEqual(
+                self.manager.get_entities_in_radius(x, y, r),
+                self.brute_force(lambda s: (s.x - x) ** 2 + (s.y - y) ** 2 <= r ** 2)
+            )
+
+    def test_nearest(self):
+        for x, y, k in [(500, 500, 1), (0, 0, 5), (1500, -200, 10), (250, 750, 600)]:
+            expected = sorted(self.ships, key=lambda s: ((s.x - x) ** 2 + (s.y - y) ** 2, s.pk))[:k]
+            self.assertEqual(self.manager.get_nearest_entities(x, y, k), expected)
+
+    def test_nearest_empty(self):
+        manager = engine.Manager(width=1000)
+        self.assertEqual(manager.get_nearest_entities(500, 500, 3), [])
+
+    def test_moves(self):
+        ship = self.ships[0]
+        ship.x, ship.y = 5000, 5000
+        self.assertEqual(self.manager.get_entities_in_radius(5000, 5000, 1), {ship.pk: ship})
+        self.assertEqual(self.manager.get_nearest_entities(4000, 4000), [ship])
+
+        del ship.x
+        self.assertEqual(self.manager.get_entities_in_radius(5000, 5000, 1), {})
+        ship.x = 5000
+        self.assertEqual(self.manager.get_entities_in_radius(5000, 5000, 1), {ship.pk: ship})
+
+        self.manager.unregister_entity(ship)
+        self.assertEqual(self.manager.get_entities_in_radius(5000, 5000, 1), {})
+        self.assertEqual(len(self.manager._spatial), 499)
+
+
+class MovementIndexTestCase(unittest.TestCase):
+    def test_index_follows_movement(self):
+        state = {
+            'turn': 2500, 'width': 1000, 'seq': 2,
+            'entities': [
+                {'pk': 0, 'type': 'ship', 'x': 480, 'y': 235},
+                {'pk': 1, 'type': 'movement_order', 'actor_id': 0, 'seq': 0, 'x_t': 168, 'y_t': 870, 'warp': 10}
+            ]
+        }
+
+        S = engine.GameState(state, {})
+        S.generate()
+
+        ship = S.manager.get_entity('metadata', 0)
+        self.assertEqual((ship.x, ship.y), (436, 325))
+        self.assertEqual(S.manager.get_entities_in_rect(436, 325, 436, 325), {0: ship})
+        self.assertEqual(S.manager.get_entities_in_radius(480, 235, 50), {})
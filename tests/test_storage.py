@@ -0,0 +1,128 @@
+import array
+import copy
+import json
+import unittest
+from decimal import Decimal
+
+from universe import components, engine, storage
+
+
+STATE = {
+    'turn': 2500, 'width': 1000, 'seq': 6,
+    'entities': [
+        {'pk': 0, 'type': 'species', 'name': 'Human', 'plural_name': 'Humans', 'growth_rate': 15,
+         'gravity_immune': True, 'temperature_immune': True, 'radiation_immune': True,
+         'population_per_r': 1000, 'factories_produce_r': 10, 'factories_cost_r': 10,
+         'factories_per_pop': 10, 'factories_cost_less': False, 'minerals_per_m': 10,
+         'mines_cost_r': 5, 'mines_per_pop': 10},
+        {'pk': 1, 'type': 'planet', 'x': 300, 'y': 600, 'gravity': 27, 'temperature': 36, 'radiation': 45,
+         'ironium_conc': 67, 'boranium_conc': 78, 'germanium_conc': 82, 'ironium': 20, 'boranium': 30,
+         'germanium': 40, 'owner_id': 0, 'population': 1000},
+        {'pk': 2, 'type': 'ship', 'x': 480, 'y': 235, 'owner_id': 0, 'population': 1000},
+        {'pk': 3, 'type': 'planet', 'x': 700, 'y': 100, 'gravity': 50, 'temperature': 50, 'radiation': 50,
+         'ironium_conc': 10, 'boranium_conc': 20, 'germanium_conc': 30},
+        {'pk': 4, 'type': 'movement_order', 'actor_id': 2, 'seq': 0, 'x_t': 500, 'y_t': 300, 'warp': 6},
+        {'pk': 5, 'type': 'movement_order', 'actor_id': 2, 'seq': 1, 'target_id': 3, 'warp': 9},
+    ]
+}
+
+UPDATES = {0: [
+    {'action': 'delete', 'actor_id': 2, 'seq': 1},
+    {'action': 'create', 'type': 'movement_order', 'actor_id': 2, 'seq': 2, 'target_id': 1, 'warp': 3},
+]}
+
+
+class ColumnStorageTestCase(unittest.TestCase):
+    def setUp(self):
+        self.manager = engine.Manager(backend=storage.ColumnStorage())
+        self.manager.register_entity_type('ship', [
+            components.PositionComponent(),
+            components.OwnershipComponent(),
+        ])
+        engine.Entity.register_manager(self.manager)
+
+    def test_fields(self):
+        ship = engine.Entity(type='ship', x=480, y=235)
+
+        self.assertEqual(type(ship).__slots__, ('_row',))
+        self.assertEqual((ship.x, ship.y), (480, 235))
+        self.assertIsNone(ship.pk)
+        self.assertIsNone(ship.owner_id)
+        self.assertNotIn('x', ship.__dict__)
+
+        ship.x = 2 ** 70
+        ship.y = Decimal('1.5')
+        ship.warp = True
+        self.assertEqual((ship.x, ship.y, ship.warp), (2 ** 70, Decimal('1.5'), True))
+        self.assertIs(type(ship.warp), bool)
+
+        del ship.x
+        self.assertIsNone(ship.x)
+        with self.assertRaises(AttributeError):
+            del ship.x
+
+    def test_values_set_aside(self):
+        table = self.manager.storage.tables['ship']
+        ship = engine.Entity(type='ship', x=1, y=2)
+        ship.x = Decimal('1.5')
+        ship.y = 2 ** 70
+        self.assertEqual((ship.x, ship.y), (Decimal('1.5'), 2 ** 70))
+        self.assertEqual(table.columns['x'].aside, {ship._row: Decimal('1.5')})
+
+        ship.x = 3
+        del ship.y
+        self.assertEqual((ship.x, ship.y), (3, None))
+        self.assertEqual(table.columns['x'].aside, {})
+        self.assertEqual(table.columns['y'].aside, {})
+        self.assertIsInstance(table.columns['x'].values, array.array)
+
+    def test_iter_values(self):
+        slot_manager = engine.Manager()
+        engine.GameState.register_entity_types(slot_manager)
+        column_manager = engine.Manager(backend=storage.ColumnStorage())
+        engine.GameState.register_entity_types(column_manager)
+
+        results = []
+        for manager in (slot_manager, column_manager):
+            engine.Entity.register_manager(manager)
+            manager.import_data(copy.deepcopy(STATE), {})
+            results.append([
+                dict(manager.iter_values('population', 'population')),
+                dict(manager.iter_values('position', 'x')),
+                dict(manager.iter_values('movement_orders', 'target_id')),
+                {pk: value.pk for pk, value in manager.iter_values('ownership', 'owner')},
+            ])
+        self.assertEqual(results[0], results[1])
+        self.assertEqual(results[1][0], {1: 1000, 2: 1000})
+        self.assertEqual(results[1][3], {1: 0, 2: 0})
+
+
+class ColumnarGameStateTestCase(unittest.TestCase):
+    def test_generate(self):
+        expected = engine.GameState(json.loads(json.dumps(STATE)), copy.deepcopy(UPDATES)).generate()
+        S = engine.GameState(json.loads(json.dumps(STATE)), copy.deepcopy(UPDATES), columnar=True)
+        results = S.generate()
+
+        self.assertIsInstance(S.manager.storage, storage.ColumnStorage)
+        self.assertEqual(results, expected)
+
+        # The moved ship and the removed order leave the int64 columns typed.
+        for _type, table in S.manager.storage.tables.items():
+            for name, column in table.columns.items():
+                self.assertEqual(isinstance(column.values, array.array), column.typed, (_type, name))
+        self.assertEqual(S.manager.storage.tables['ship'].columns['x'].aside, {})
+        self.assertIn(None, S.manager.storage.tables['movement_order'].columns['pk'].values)
+        self.assertEqual(sorted(dict(S.manager.iter_values('orders', 'seq'))), [4, 6])
+
+    @unittest.skipIf(storage.numpy is None, "NumPy is not installed.")
+    def test_arrays(self):
+        results = []
+        for columnar in (False, True):
+            manager = engine.GameState(json.loads(json.dumps(STATE)), {}, columnar=columnar).manager
+            manager.get_entity('metadata', 3).population = Decimal('2.5')
+            results.append([dict(zip(*(array.tolist() for array in manager.get_arrays(_type, name))))
+                            for _type, name in [('population', 'population'), ('position', 'x'),
+                                                ('ownership', 'owner_id'), ('movement_orders', 'target_id')]])
+        self.assertEqual(results[0], results[1])
+        self.assertEqual(results[1][0], {1: 1000, 2: 1000})
+        self.assertEqual(results[1][2], {1: 0, 2: 0})
@@ -1,6 +1,9 @@
+import copy
+import random
 import unittest
+from unittest import mock
 
-from universe import engine, systems
+from universe import engine, systems, utils
 
 
 class UpdateTestCase(unittest.TestCase):
@@ -542,6 +545,186 @@ class UpdateTestCase(unittest.TestCase):
             {'pk': 3, 'type': 'movement_order', 'actor_id': 2, 'seq': 0, 'x_t': 637, 'y_t': 786, 'warp': 8}
         )
 
+    def test_matches_sequential(self):
+        def apply_sequentially(manager):
+            for data in copy.deepcopy(manager._updates):
+                action = data.pop('action')
+                if action == 'create':
+                    if manager.get_order(data['actor_id'], data['seq']) is None:
+                        manager.register_entity(data)
+                elif action == 'reorder':
+                    order1 = manager.get_order(data['actor_id'], data['seq1'])
+                    order2 = manager.get_order(data['actor_id'], data['seq2'])
+                    if order1 is not None and order2 is not None:
+                        order1.seq, order2.seq = order2.seq, order1.seq
+                else:
+                    order = manager.get_order(data['actor_id'], data['seq'])
+                    if order is not None and action == 'update':
+                        for k, v in data.items():
+                            setattr(order, k, v)
+                    elif order is not None:
+                        manager.unregister_entity(order)
+
+        rng = random.Random(22)
+        entities = [{'pk': 0, 'type': 'species', 'name': 'Human', 'plural_name': 'Humans', 'growth_rate': 15,
+                     'gravity_immune': True, 'temperature_immune': True, 'radiation_immune': True,
+                     'population_per_r': 1000, 'factories_produce_r': 10, 'factories_cost_r': 10,
+                     'factories_per_pop': 10, 'factories_cost_less': False, 'minerals_per_m': 10,
+                     'mines_cost_r': 5, 'mines_per_pop': 10}]
+        ships = list(range(1, 6))
+        entities.extend({'pk': pk, 'type': 'ship', 'x': 480, 'y': 235, 'owner_id': 0} for pk in ships)
+        for actor_id in ships:
+            for seq in range(rng.randint(0, 5)):
+                entities.append({'pk': len(entities), 'type': 'movement_order', 'actor_id': actor_id, 'seq': seq,
+                                 'x_t': rng.randint(0, 999), 'y_t': rng.randint(0, 999), 'warp': rng.randint(1, 9)})
+        state = {'turn': 2500, 'width': 1000, 'seq': len(entities), 'entities': entities}
+
+        updates = []
+        for _ in range(300):
+            action, actor_id = rng.choice(['create', 'reorder', 'update', 'delete']), rng.choice(ships)
+            update = {'action': action, 'actor_id': actor_id}
+            if action == 'reorder':
+                update.update(seq1=rng.randint(0, 7), seq2=rng.randint(0, 7))
+            else:
+                update['seq'] = rng.randint(0, 7)
+            if action == 'create':
+                update.update(type='movement_order', x_t=rng.randint(0, 999), y_t=rng.randint(0, 999))
+            if action in ('create', 'update'):
+                update['warp'] = rng.randint(1, 9)
+            updates.append(update)
+        updates = {0: updates}
+        original = copy.deepcopy(updates)
+
+        expected = engine.GameState(state, updates)
+        apply_sequentially(expected.manager)
+        expected = expected.manager.export_data()
+
+        for _ in range(2):
+            S = engine.GameState(state, updates)
+            systems.UpdateSystem().process(S.manager)
+            self.assertEqual(S.manager.export_data(), expected)
+            self.assertEqual(updates, original)
+
+
+class SteppedMovementSystem(systems.MovementSystem):
+    def _interceptions(self, movements):
+        return set(movements)
+
+
+class MovementTestCase(unittest.TestCase):
+    def random_state(self, rng, count):
+        entities, seq = [], 0
+        for _ in range(count):
+            x, y, warp = rng.randint(0, 999), rng.randint(0, 999), rng.randint(0, 10)
+            entities.append({'pk': seq, 'type': 'ship', 'x': x, 'y': y})
+            seq += 1
+            if rng.random() < 0.2:
+                continue
+
+            if rng.random() < 0.25:
+                order = {'target_id': rng.choice([E['pk'] for E in entities if E['type'] == 'ship'][:-1] or [0])}
+            else:
+                # Keep most goals around one turn's travel away, where the endpoint is the most sensitive.
+                reach = rng.choice([warp ** 2, warp ** 2 + 1, 2 * warp ** 2, 500])
+                order = {'x_t': x + rng.randint(-reach, reach), 'y_t': y + rng.randint(-reach, reach)}
+            order.update({'pk': seq, 'type': 'movement_order', 'actor_id': seq - 1, 'seq': 0, 'warp': warp})
+            if order.get('target_id') != order['actor_id']:
+                entities.append(order)
+                seq += 1
+        return {'turn': 2500, 'width': 1000, 'seq': seq, 'entities': entities}
+
+    def test_direct_matches_stepped(self):
+        rng = random.Random(2500)
+        state = self.random_state(rng, 100)
+
+        direct = engine.GameState(state, {})
+        systems.MovementSystem().process(direct.manager)
+        stepped = engine.GameState(state, {})
+        SteppedMovementSystem().process(stepped.manager)
+
+        self.assertEqual(
+            [E.serialize() for E in direct.manager.get_entities('metadata').values()],
+            [E.serialize() for E in stepped.manager.get_entities('metadata').values()],
+        )
+
+    def test_interceptions(self):
+        state = {
+            'turn': 2500, 'width': 1000, 'seq': 10,
+            'entities': [
+                {'pk': 0, 'type': 'ship', 'x': 480, 'y': 235},
+                {'pk': 1, 'type': 'ship', 'x': 460, 'y': 215},
+                {'pk': 2, 'type': 'ship', 'x': 500, 'y': 205},
+                {'pk': 3, 'type': 'ship', 'x': 520, 'y': 205},
+                {'pk': 4, 'type': 'movement_order', 'actor_id': 0, 'seq': 0, 'target_id': 1, 'warp': 10},
+                {'pk': 5, 'type': 'movement_order', 'actor_id': 1, 'seq': 0, 'x_t': 465, 'y_t': 220, 'warp': 10},
+                {'pk': 6, 'type': 'movement_order', 'actor_id': 2, 'seq': 0, 'target_id': 3, 'warp': 10},
+                {'pk': 7, 'type': 'movement_order', 'actor_id': 3, 'seq': 0, 'x_t': 600, 'y_t': 600, 'warp': 5},
+                {'pk': 8, 'type': 'movement_order', 'actor_id': 3, 'seq': 1, 'target_id': 0, 'warp': 5},
+            ]
+        }
+
+        S = engine.GameState(state, {})
+        movements = {_id: S.manager.get_orders(_id)[0] for _id in range(4)}
+
+        self.assertEqual(systems.MovementSystem()._interceptions(movements), {0, 1, 2, 3})
+
+        del movements[0]
+        self.assertEqual(systems.MovementSystem()._interceptions(movements), {2, 3})
+
+
+@unittest.skipIf(systems.numpy is None, "NumPy is not installed.")
+class VectorizedMovementTestCase(unittest.TestCase):
+    def random_state(self, rng, count):
+        # Pairs, cycles and chains of ships chasing each other, some of them after a fixed goal.
+        entities = [{'pk': pk, 'type': 'ship', 'x': rng.randint(400, 600), 'y': rng.randint(400, 600)}
+                    for pk in range(count)]
+        for pk in range(count):
+            order = {'pk': count + pk, 'type': 'movement_order', 'actor_id': pk, 'seq': 0,
+                     'warp': rng.randint(1, 10)}
+            if rng.random() < 0.3:
+                order.update(x_t=rng.randint(400, 600), y_t=rng.randint(400, 600))
+            else:
+                order.update(target_id=rng.choice([_id for _id in range(count) if _id != pk]))
+            entities.append(order)
+        return {'turn': 2500, 'width': 1000, 'seq': 2 * count, 'entities': entities}
+
+    def test_matches_decimal(self):
+        rng = random.Random(2500)
+        for _ in range(5):
+            state = self.random_state(rng, 12)
+
+            decimal = engine.GameState(state, {})
+            systems.MovementSystem().process(decimal.manager)
+            vectorized = engine.GameState(state, {}, vectorized=True)
+            systems.VectorizedMovementSystem().process(vectorized.manager)
+
+            self.assertEqual(
+                [E.serialize() for E in vectorized.manager.get_entities('metadata').values()],
+                [E.serialize() for E in decimal.manager.get_entities('metadata').values()],
+            )
+
+    def test_four_way_cycle_intercept(self):
+        state = {
+            'turn': 2500, 'width': 1000, 'seq': 8,
+            'entities': [
+                {'pk': 0, 'type': 'ship', 'x': 500, 'y': 500},
+                {'pk': 1, 'type': 'ship', 'x': 600, 'y': 500},
+                {'pk': 2, 'type': 'ship', 'x': 600, 'y': 600},
+                {'pk': 3, 'type': 'ship', 'x': 500, 'y': 600},
+                {'pk': 4, 'type': 'movement_order', 'actor_id': 0, 'seq': 0, 'target_id': 1, 'warp': 10},
+                {'pk': 5, 'type': 'movement_order', 'actor_id': 1, 'seq': 0, 'target_id': 2, 'warp': 10},
+                {'pk': 6, 'type': 'movement_order', 'actor_id': 2, 'seq': 0, 'target_id': 3, 'warp': 10},
+                {'pk': 7, 'type': 'movement_order', 'actor_id': 3, 'seq': 0, 'target_id': 0, 'warp': 10},
+            ]
+        }
+
+        S = engine.GameState(state, {}, vectorized=True)
+        results = S.generate()
+
+        self.assertEqual(len(results['entities']), 4)
+        coordinates = {(entity['x'], entity['y']) for entity in results['entities']}
+        self.assertEqual(coordinates, {(550, 550)})
+
 
 class MiningTestCase(unittest.TestCase):
     def test_uninhabited(self):
@@ -791,6 +974,45 @@ class MiningTestCase(unittest.TestCase):
         self.assertEqual(planets[1].germanium or 0, 10)
         self.assertEqual(planets[1].boranium or 0, 10)
 
+    def test_batches_match_utils(self):
+        random.seed(18)
+        species = [
+            {'pk': pk, 'type': 'species', 'name': 'Human', 'plural_name': 'Humans', 'growth_rate': 15,
+             'gravity_immune': True, 'temperature_immune': True, 'radiation_immune': True,
+             'population_per_r': 1000, 'factories_produce_r': 10, 'factories_cost_r': 10,
+             'factories_per_pop': 10, 'factories_cost_less': False, 'minerals_per_m': random.randint(5, 25),
+             'mines_cost_r': 5, 'mines_per_pop': random.randint(5, 25)}
+            for pk in range(3)
+        ]
+        planets = [
+            {'pk': pk, 'type': 'planet', 'x': 0, 'y': 0, 'gravity': 50, 'temperature': 50, 'radiation': 50,
+             'ironium_conc': random.randint(0, 100), 'boranium_conc': random.randint(0, 100),
+             'germanium_conc': random.randint(0, 100), 'ironium': random.randint(0, 50),
+             'population': random.choice([0, 9_999, random.randint(0, 10 ** 7), 2 ** 50]),
+             'mines': random.choice([0, random.randint(0, 20_000)]), 'owner_id': random.choice([0, 1, 2])}
+            for pk in range(3, 400)
+        ]
+        for planet in planets[::5]:
+            del planet['owner_id']
+        state = {'turn': 2500, 'width': 1000, 'entities': species + planets}
+
+        for use_numpy in (True, False):
+            S = engine.GameState(state, {})
+            manager = S.manager
+            expected = {}
+            for pk, planet in manager.get_entities('mineral_concentrations').items():
+                owner = manager.get_entity('species', planet.owner_id)
+                mined = utils.mining(owner, planet) if owner is not None else (0, 0, 0)
+                expected[pk] = tuple((value or 0) + mined[i]
+                                     for i, value in enumerate((planet.ironium, planet.boranium, planet.germanium)))
+
+            with mock.patch.object(systems, 'numpy', systems.numpy if use_numpy else None):
+                systems.MiningSystem().process(manager)
+
+            results = {pk: (planet.ironium or 0, planet.boranium or 0, planet.germanium or 0)
+                       for pk, planet in manager.get_entities('mineral_concentrations').items()}
+            self.assertEqual(results, expected)
+
 
 class PopulationGrowthTestCase(unittest.TestCase):
     def test_habitability_growth(self):
@@ -1099,3 +1321,94 @@ class PopulationGrowthTestCase(unittest.TestCase):
         self.assertEqual(len(results['entities']), 2)
         self.assertNotIn('population', results['entities'][1])
         self.assertNotIn('owner_id', results['entities'][1])
+
+    def test_batches_match_utils(self):
+        rng = random.Random(19)
+        species = []
+        for pk in range(4):
+            data = {'pk': pk, 'type': 'species', 'name': 'Human', 'plural_name': 'Humans',
+                    'growth_rate': rng.randint(1, 20), 'population_per_r': 1000, 'factories_produce_r': 10,
+                    'factories_cost_r': 10, 'factories_per_pop': 10, 'factories_cost_less': False,
+                    'minerals_per_m': 10, 'mines_cost_r': 5, 'mines_per_pop': 10}
+            for env in utils.ENVIRONMENTS:
+                data[f'{env}_immune'] = rng.random() < 0.3
+                if not data[f'{env}_immune']:
+                    low = rng.randint(0, 70)
+                    data[f'{env}_min'], data[f'{env}_max'] = low, rng.randint(low + 2, 100)
+            species.append(data)
+
+        planets = []
+        for pk in range(4, 600):
+            planet = {'pk': pk, 'type': 'planet', 'x': 0, 'y': 0, 'gravity': rng.randint(0, 100),
+                      'temperature': rng.randint(0, 100), 'radiation': rng.randint(0, 100),
+                      'ironium_conc': 50, 'boranium_conc': 50, 'germanium_conc': 50}
+            if rng.random() < 0.9:
+                planet['owner_id'] = rng.randint(0, 3)
+                planet['population'] = rng.choice([
+                    0, rng.randint(1, 10 ** 5), rng.randint(1, 10 ** 6), rng.randint(1, 10 ** 6),
+                    rng.randint(1, 5 * 10 ** 6), rng.randint(1, 10 ** 8), 2 ** 35, 2 ** 45,
+                ])
+            planets.append(planet)
+        state = {'turn': 2500, 'width': 1000, 'seq': 600, 'entities': species + planets}
+
+        for fixed_point in (False, True):
+            for use_numpy in (True, False):
+                manager = engine.GameState(state, {}, fixed_point=fixed_point).manager
+                expected, cases, unbatched = {}, set(), 0
+                for pk, planet in manager.get_entities('population').items():
+                    expected[pk] = (planet.population, planet.owner_id)
+                    if planet.owner_id is None:
+                        continue
+                    owner = manager.get_entity('species', planet.owner_id)
+                    planet_value = utils.planet_value(owner, planet)
+                    if planet_value == 0:
+                        # Growth is undefined on planets without any capacity.
+                        planet.population = 0
+                    if planet_value == 0 or planet.population >= systems.PopulationGrowthSystem.MAX_POPULATION:
+                        unbatched += 1
+                    elif planet_value < 0:
+                        cases.add('red')
+                    elif 0 < planet.population <= 10_000 * planet_value < 4 * planet.population:
+                        cases.add('filling')
+                    population = utils.population_growth(planet.population, owner.growth_rate, planet_value)
+                    expected[pk] = (population, planet.owner_id) if population > 0 else (None, None)
+                self.assertEqual(cases, {'red', 'filling'})
+
+                growth = 'fixed_population_growth' if fixed_point else 'population_growth'
+                with mock.patch.object(systems, 'numpy', systems.numpy if use_numpy else None), \
+                        mock.patch.object(utils, growth, wraps=getattr(utils, growth)) as per_planet:
+                    systems.PopulationGrowthSystem().process(manager)
+
+                results = {pk: (planet.population, planet.owner_id)
+                           for pk, planet in manager.get_entities('population').items()}
+                self.assertEqual(results, expected)
+                if use_numpy and systems.numpy is not None:
+                    # Only the planets without capacity or with too large a population are grown one by one.
+                    self.assertEqual(per_planet.call_count, unbatched)
+
+
+class FixedPointTestCase(unittest.TestCase):
+    def test_matches_decimal(self):
+        species = {
+            'pk': 0, 'type': 'species', 'name': 'Human', 'plural_name': 'Humans', 'growth_rate': 15,
+            'gravity_immune': False, 'gravity_min': 20, 'gravity_max': 80,
+            'temperature_immune': False, 'temperature_min': 10, 'temperature_max': 64,
+            'radiation_immune': True,
+            'population_per_r': 1000, 'factories_produce_r': 10, 'factories_cost_r': 10, 'factories_per_pop': 10,
+            'factories_cost_less': False, 'minerals_per_m': 10, 'mines_cost_r': 5, 'mines_per_pop': 10,
+        }
+        rng = random.Random(2500)
+        planets = []
+        for pk in range(1, 301):
+            planet = {'pk': pk, 'type': 'planet', 'x': rng.randint(0, 999), 'y': rng.randint(0, 999),
+                      'gravity': rng.randint(1, 99), 'temperature': rng.randint(1, 99), 'radiation': 50,
+                      'ironium_conc': rng.randint(1, 99), 'boranium_conc': rng.randint(1, 99),
+                      'germanium_conc': rng.randint(1, 99), 'mines': rng.randint(0, 500),
+                      'owner_id': 0, 'population': rng.randint(1, 3_000_000)}
+            planets.append(planet)
+        state = {'turn': 2500, 'width': 1000, 'seq': 301, 'entities': [species] + planets}
+
+        self.assertEqual(
+            engine.GameState(state, {}, fixed_point=True).generate(),
+            engine.GameState(state, {}).generate(),
+        )
@@ -1,3 +1,4 @@
+import random
 import unittest
 
 from universe import components, engine, utils
@@ -1002,3 +1003,239 @@ class PlanetValueTestCase(unittest.TestCase):
                  'radiation': r}
             )
             self.assertEqual(utils.planet_value(species, planet), value)
+
+
+class CachedPlanetValueTestCase(unittest.TestCase):
+    def setUp(self):
+        self.manager = engine.Manager()
+        self.manager.register_entity_type('species', [
+            components.SpeciesEnvironmentComponent(),
+        ])
+        self.manager.register_entity_type('planet', [
+            components.EnvironmentComponent(),
+        ])
+        engine.Entity.register_manager(self.manager)
+        utils.cached_planet_value.cache_clear()
+
+    def tearDown(self):
+        utils.cached_planet_value.cache_clear()
+
+    def test_matches_planet_value(self):
+        species = [
+            self.manager.register_entity({
+                'type': 'species',
+                'gravity_immune': False, 'gravity_min': 32, 'gravity_max': 86,
+                'temperature_immune': False, 'temperature_min': 10, 'temperature_max': 64,
+                'radiation_immune': False, 'radiation_min': 38, 'radiation_max': 90,
+            }),
+            self.manager.register_entity({
+                'type': 'species',
+                'gravity_immune': True,
+                'temperature_immune': False, 'temperature_min': 0, 'temperature_max': 40,
+                'radiation_immune': True,
+            }),
+        ]
+        random.seed(0)
+        planets = [self.manager.register_entity(dict(type='planet', **components.EnvironmentComponent.random()))
+                   for _ in range(200)]
+
+        for S in species:
+            for planet in planets:
+                self.assertEqual(utils.cached_planet_value(S, planet), utils.planet_value(S, planet))
+
+    def test_counters(self):
+        species = self.manager.register_entity({
+            'type': 'species', 'gravity_immune': True, 'temperature_immune': True, 'radiation_immune': True,
+        })
+        planet = self.manager.register_entity({'type': 'planet', 'gravity': 50, 'temperature': 50, 'radiation': 50})
+        other = self.manager.register_entity({'type': 'planet', 'gravity': 50, 'temperature': 50, 'radiation': 50})
+
+        utils.cached_planet_value(species, planet)
+        utils.cached_planet_value(species, planet)
+        utils.cached_planet_value(species, other)
+        info = utils.cached_planet_value.cache_info()
+        self.assertEqual((info.hits, info.misses, info.currsize), (2, 1, 1))
+
+        species.temperature_immune = False
+        species.temperature_min, species.temperature_max = 0, 20
+        self.assertEqual(utils.cached_planet_value(species, planet), -15)
+        self.assertEqual(utils.cached_planet_value.cache_info().misses, 2)
+
+        utils.cached_planet_value.cache_clear()
+        self.assertEqual(utils.cached_planet_value.cache_info().currsize, 0)
+
+
+class HabitabilityTableTestCase(unittest.TestCase):
+    def setUp(self):
+        self.manager = engine.Manager()
+        self.manager.register_entity_type('species', [
+            components.SpeciesEnvironmentComponent(),
+        ])
+        self.manager.register_entity_type('planet', [
+            components.EnvironmentComponent(),
+        ])
+        engine.Entity.register_manager(self.manager)
+
+    def random_species(self, rng):
+        data = {'type': 'species'}
+        for env in utils.ENVIRONMENTS:
+            data[f'{env}_immune'] = rng.random() < 0.2
+            if not data[f'{env}_immune']:
+                low = rng.randint(0, 98)
+                data[f'{env}_min'], data[f'{env}_max'] = low, rng.randint(low + 2, 100)
+        return self.manager.register_entity(data)
+
+    def test_matches_planet_value(self):
+        rng = random.Random(0)
+        for _ in range(20):
+            species = self.random_species(rng)
+            table = utils.HabitabilityTable.from_species(species)
+            for _ in range(500):
+                planet = self.manager.register_entity(
+                    {'type': 'planet', 'gravity': rng.randint(0, 100), 'temperature': rng.randint(0, 100),
+                     'radiation': rng.randint(0, 100)})
+                self.assertEqual(table.planet_value(planet), utils.planet_value(species, planet))
+
+    @unittest.skipIf(utils.numpy is None, "NumPy is not installed.")
+    def test_planet_values(self):
+        rng = random.Random(19)
+        species = [self.random_species(rng) for _ in range(20)]
+        species.append(self.manager.register_entity({
+            'type': 'species', 'gravity_immune': True, 'temperature_immune': True,
+            'radiation_immune': False, 'radiation_min': 50, 'radiation_max': 51,
+        }))
+        planets = [
+            self.manager.register_entity(
+                {'type': 'planet', 'gravity': rng.randint(0, 100), 'temperature': rng.randint(0, 100),
+                 'radiation': rng.choice([rng.randint(0, 49), rng.randint(51, 100), 51, 52])})
+            for _ in range(500)
+        ]
+        environments = utils.numpy.array([utils.environment(planet) for planet in planets])
+        for s in species:
+            table = utils.HabitabilityTable.from_species(s)
+            self.assertEqual(table.planet_values(environments).tolist(),
+                             [utils.planet_value(s, planet) for planet in planets])
+
+    def test_degenerate_range(self):
+        species = self.manager.register_entity({
+            'type': 'species', 'gravity_immune': True, 'temperature_immune': True,
+            'radiation_immune': False, 'radiation_min': 50, 'radiation_max': 51,
+        })
+        table = utils.HabitabilityTable.from_species(species)
+
+        planet = self.manager.register_entity({'type': 'planet', 'gravity': 50, 'temperature': 50, 'radiation': 52})
+        self.assertEqual(table.planet_value(planet), utils.planet_value(species, planet))
+
+        planet.radiation = 50
+        with self.assertRaises(ZeroDivisionError):
+            table.planet_value(planet)
+
+    def test_manager_tables(self):
+        species = self.random_species(random.Random(1))
+        table = self.manager.get_habitability_table(species)
+
+        self.assertIs(self.manager.get_habitability_table(species), table)
+        self.assertEqual(table.ranges, utils.environment_ranges(species))
+
+        # A species whose environment changes gets a table for its new ranges.
+        species.gravity_immune, species.gravity_min, species.gravity_max = False, 10, 30
+        planet = self.manager.register_entity({'type': 'planet', 'gravity': 20, 'temperature': 50, 'radiation': 50})
+        changed = self.manager.get_habitability_table(species)
+        self.assertIsNot(changed, table)
+        self.assertEqual(changed.ranges, utils.environment_ranges(species))
+        self.assertEqual(changed.planet_value(planet), utils.planet_value(species, planet))
+
+
+class FixedPointTestCase(unittest.TestCase):
+    """Differential tests of the integer implementations against the Decimal ones."""
+
+    def setUp(self):
+        self.manager = engine.Manager()
+        self.manager.register_entity_type('species', [
+            components.SpeciesComponent(),
+            components.SpeciesEnvironmentComponent(),
+            components.SpeciesProductionComponent(),
+        ])
+        self.manager.register_entity_type('planet', [
+            components.EnvironmentComponent(),
+            components.MineralConcentrationComponent(),
+            components.PlanetaryFacilitiesComponent(),
+            components.PopulationComponent(),
+        ])
+        engine.Entity.register_manager(self.manager)
+        random.seed(2500)
+
+    def random_species(self):
+        data = {'type': 'species', 'growth_rate': random.randint(1, 20),
+                'mines_per_pop': random.randint(5, 25), 'minerals_per_m': random.randint(5, 25)}
+        for env in utils.ENVIRONMENTS:
+            data[f'{env}_immune'] = random.random() < 0.1
+            if not data[f'{env}_immune']:
+                low = random.randint(0, 80)
+                data[f'{env}_min'], data[f'{env}_max'] = low, random.randint(low + 2, 100)
+        return self.manager.register_entity(data)
+
+    def random_planet(self):
+        data = {'type': 'planet', 'mines': random.randint(0, 2000), 'population': random.randint(0, 5_000_000)}
+        data.update(components.EnvironmentComponent.random())
+        data.update(components.MineralConcentrationComponent.random())
+        return self.manager.register_entity(data)
+
+    def test_population_growth(self):
+        for _ in range(50):
+            species = self.random_species()
+            for _ in range(200):
+                planet_value = utils.planet_value(species, self.random_planet())
+                if planet_value == 0:
+                    continue
+                # Cover every crowding regime of the planet's capacity.
+                capacity = 10_000 * max(planet_value, 1)
+                population = random.choice([
+                    0, random.randint(1, capacity // 4), random.randint(capacity // 4, capacity),
+                    random.randint(capacity, 4 * capacity), random.randint(4 * capacity, 10 * capacity),
+                ])
+                self.assertEqual(
+                    utils.fixed_population_growth(population, species.growth_rate, planet_value),
+                    utils.population_growth(population, species.growth_rate, planet_value),
+                    f"population: {population}, growth rate: {species.growth_rate}, planet value: {planet_value}"
+                )
+
+    def test_population_growth_ties(self):
+        # Exact results on a tie, where the rounding of intermediate Decimal results decides.
+        data = [
+            (12500, 20, 2), (22500, 10, 3), (22500, 20, 6), (52500, 20, 6),
+            (45000, 1, 12), (67500, 10, 15), (97500, 10, 15),
+        ]
+        for population, growth_rate, planet_value in data:
+            self.assertEqual(
+                utils.fixed_population_growth(population, growth_rate, planet_value),
+                utils.population_growth(population, growth_rate, planet_value),
+            )
+            self.assertEqual(
+                utils._replay_population_growth(population, growth_rate, planet_value),
+                utils.population_growth(population, growth_rate, planet_value),
+            )
+
+    def test_replay(self):
+        for _ in range(2000):
+            planet_value = random.randint(-45, 100) or 1
+            population = random.randint(0, 50_000 * abs(planet_value))
+            growth_rate = random.randint(1, 20)
+            self.assertEqual(
+                utils._replay_population_growth(population, growth_rate, planet_value),
+                utils.population_growth(population, growth_rate, planet_value),
+            )
+
+    def test_no_capacity(self):
+        for population in (0, 1000):
+            with self.assertRaises(ArithmeticError):
+                utils.population_growth(population, 15, 0)
+            with self.assertRaises(ArithmeticError):
+                utils.fixed_population_growth(population, 15, 0)
+
+    def test_mining(self):
+        for _ in range(50):
+            species = self.random_species()
+            for _ in range(200):
+                planet = self.random_planet()
+                self.assertEqual(utils.fixed_mining(species, planet), utils.mining(species, planet))
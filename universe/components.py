@@ -1,9 +1,50 @@
+import inspect
 import math
 import random
 
 from . import fields, exceptions
 
 
+def _defined_by(cls, attr):
+    return next(klass for klass in cls.__mro__ if attr in klass.__dict__)
+
+
+def compile_validator(component_cls):
+    """Generates a single function doing the field validation of `component_cls`.
+
+    The checks of each field are inlined in declaration order, followed by a call to the
+    `validate_<name>` hook of the component for that field, if it has one.  Fields are compiled
+    as they are when the class is created.
+    """
+    namespace = {'ValidationError': exceptions.ValidationError}
+
+    def ref(obj):
+        name = f'_{len(namespace)}'
+        namespace[name] = obj
+        return name
+
+    lines = []
+    for name, field in component_cls._fields.items():
+        field_cls = type(field)
+        if issubclass(_defined_by(field_cls, 'validation_source'), _defined_by(field_cls, 'validate')):
+            lines.extend(field.validation_source(ref))
+        else:
+            lines.append(f"{ref(field)}.validate(data)")
+
+        hook = inspect.getattr_static(component_cls, f'validate_{name}', None)
+        if inspect.isfunction(hook):
+            lines.append(f"{ref(hook)}(self, data)")
+        elif hook is not None:
+            lines.append(f"self.validate_{name}(data)")
+
+    body = ''.join(f"    {line}\n" for line in lines) or "    pass\n"
+    exec(f"def _validate_fields(self, data):\n{body}", namespace)
+    validator = namespace['_validate_fields']
+    validator.__qualname__ = f'{component_cls.__qualname__}._validate_fields'
+    validator.compiled = True
+    return validator
+
+
 class MetaComponent(type):
     def __new__(cls, name, bases, attrs, **kwargs):
         super_new = super().__new__
@@ -17,15 +58,18 @@ class MetaComponent(type):
                 new_attrs[name] = f
 
         new_class = super_new(cls, name, bases, new_attrs, **kwargs)
+
+        # Components without a validate method of their own use their compiled validator directly.
+        new_class._validate_fields = compile_validator(new_class)
+        if 'validate' not in attrs and getattr(new_class.validate, 'compiled', False):
+            new_class.validate = new_class._validate_fields
         return new_class
 
 
 class Component(metaclass=MetaComponent):
     def validate(self, data):
-        for name, field in self._fields.items():
-            field.validate(data)
-            if hasattr(self, f'validate_{name}'):
-                getattr(self, f'validate_{name}')(data)
+        self._validate_fields(data)
+    validate.compiled = True  # only runs the field checks, so subclasses may replace it outright
 
     def serialize(self, data):
         output = {}
@@ -226,13 +270,13 @@ class MovementComponent(Component):
     def validate(self, data):
         super().validate(data)
 
-        from .engine import Entity
-        actor = Entity.manager.get_entity('metadata', data['actor_id'])
-        if actor.type != 'ship':
-            raise exceptions.ValidationError("The acting object must be a ship.")
+        # A missing or malformed actor is already reported by OrderComponent.
+        actor_id = data.get('actor_id')
+        if isinstance(actor_id, int):
+            fields.check_reference(actor_id, ('ship',), wrong_type="The acting object must be a ship.")
 
-        if data['actor_id'] == data.get('target_id'):
-            raise exceptions.ValidationError("A ship cannot target itself for a movement order.")
+            if actor_id == data.get('target_id'):
+                raise exceptions.ValidationError("A ship cannot target itself for a movement order.")
 
         if (data.get('target_id') is None) == (data.get('x_t') is None or data.get('y_t') is None):
             raise exceptions.ValidationError("Either of 'target_id' or the target coordinates must be set.")
@@ -1,70 +1,257 @@
+import logging
 import weakref
 
-from . import components, systems, exceptions
+from . import components, exceptions, fields, indexes, spatial, storage, systems, utils
 
 
-class Entity:
-    def __init__(self, **kwargs):
-        self.__dict__.update(kwargs)
-        self._components = Entity.manager._entity_registry[kwargs['type']]
+logger = logging.getLogger(__name__)
 
-    def __getattr__(self, name):
-        for component in self.__dict__.get('_components', {}).values():
-            for field in component._fields.values():
-                if name == field.data_name:
-                    return self.__dict__.get(name)
-                if name == field.name:
-                    return field.from_data(self.__dict__)
+
+class DataDescriptor:
+    """Exposes the stored data value of a field that converts values on assignment, e.g. references."""
+
+    def __init__(self, field, slot):
+        self.field = field
+        self.slot = slot
+
+    def __get__(self, instance, owner=None):
+        if instance is None:
+            return self
+        try:
+            return self.slot.__get__(instance, owner)
+        except AttributeError:
+            return None
+
+    def __set__(self, instance, value):
         try:
-            return self.__dict__[name]
-        except KeyError:
-            raise AttributeError(f"{self.__class__.__name__!r} object has no attribute {name!r}")
+            value = self.field.to_data(value)
+        except exceptions.empty:
+            try:
+                self.slot.__delete__(instance)
+            except AttributeError:
+                pass
+            return
+        self.slot.__set__(instance, value)
+
+    def __delete__(self, instance):
+        self.slot.__delete__(instance)
+
+
+class FieldDescriptor(DataDescriptor):
+    """Exposes the value of a field whose attribute name differs from its data name, e.g. references."""
+
+    def __get__(self, instance, owner=None):
+        if instance is None:
+            return self
+        return self.field.from_value(super().__get__(instance, owner), instance.manager)
+
+
+class IndexedDescriptor(DataDescriptor):
+    """Keeps an index of the manager up to date as a field changes, e.g. the spatial index."""
+
+    def __init__(self, field, slot, index):
+        super().__init__(field, slot)
+        self.index = index
+
+    def __set__(self, instance, value):
+        super().__set__(instance, value)
+        self.index.move(instance)
+
+    def __delete__(self, instance):
+        super().__delete__(instance)
+        self.index.move(instance)
+
+
+class IndexedFieldDescriptor(IndexedDescriptor, FieldDescriptor):
+    """Keeps an index of the manager up to date as a field exposed under its own name changes."""
+
+
+_unset = object()
+
+
+class RegisteredManager:
+    """The Manager last passed to Entity.register_manager in the current thread.
+
+    Serves Entity.manager on the base class; the entity classes generated by a Manager are
+    bound to it instead.
+    """
+
+    def __get__(self, instance, owner=None):
+        manager = fields.current_manager.get()
+        if manager is None:
+            raise AttributeError("No Manager has been registered; call Entity.register_manager first, or use "
+                                 "the manager of an entity or of a class from Manager.get_entity_class.")
+        return manager
+
+
+class Entity:
+    # Field data lives in the slots of the per-type subclasses generated by the Manager;
+    # anything else (e.g. per-turn scratch values) falls back to the instance dict.
+    # _dirty holds the data names of the fields written since the entity was last validated,
+    # with None meaning none of them and True meaning all of them.
+    __slots__ = ('__dict__', '_dirty')
+
+    _components = {}
+    _fields = {}
+    _slots = {}
+    _field_components = {}
+    _references = ()
+    _table = None
+    # The Manager that generated the class, which references of its entities resolve against.
+    # On the base class itself, the one registered through register_manager.
+    manager = RegisteredManager()
+
+    def __new__(cls, **kwargs):
+        if cls is Entity:
+            cls = fields.current_manager.get().get_entity_class(kwargs['type'])
+        entity = super().__new__(cls)
+        if cls._table is not None:
+            entity._row = cls._table.allocate()
+        return entity
+
+    def __init__(self, **kwargs):
+        self._dirty = True
+        for name, value in kwargs.items():
+            if name in self._slots:
+                self._slots[name].__set__(self, value)
+            else:
+                setattr(self, name, value)
 
     def __setattr__(self, name, value):
-        for component in self.__dict__.get('_components', {}).values():
-            for field in component._fields.values():
-                if name in (field.data_name, field.name):
-                    try:
-                        self.__dict__[field.data_name] = field.to_data(value)
-                    except exceptions.empty:
-                        self.__dict__.pop(field.data_name, None)
-                    return
-        self.__dict__[name] = value
+        if name not in self._fields:
+            object.__setattr__(self, name, value)
+            return
+        # Writing back the value a field already holds leaves it clean.
+        slot = self._slots[self._fields[name].data_name]
+        try:
+            previous = slot.__get__(self)
+        except AttributeError:
+            previous = _unset
+        object.__setattr__(self, name, value)
+        try:
+            current = slot.__get__(self)
+        except AttributeError:
+            current = _unset
+        if current != previous or type(current) is not type(previous):
+            self._touch(name)
 
     def __delattr__(self, name):
-        for component in self.__dict__.get('_components', {}).values():
-            for field in component._fields.values():
-                if name in (field.data_name, field.name):
-                    self.__dict__.pop(field.data_name)
-                    return
-        del self.__dict__[name]
+        object.__delattr__(self, name)
+        if name in self._fields:
+            self._touch(name)
+
+    def _touch(self, name):
+        dirty = self._dirty
+        if dirty is None:
+            self._dirty = {self._fields[name].data_name}
+        elif dirty is not True:
+            dirty.add(self._fields[name].data_name)
+
+    def dirty_components(self):
+        if self._dirty is None:
+            return []
+        if self._dirty is True:
+            return list(self._components)
+        dirty = {component for name in self._dirty for component in self._field_components[name]}
+        return [component for component in self._components if component in dirty]
+
+    def changed_fields(self):
+        if self._dirty is None:
+            return []
+        return [name for name in self._slots if self._dirty is True or name in self._dirty]
+
+    def references_any(self, pks):
+        for name in self._references:
+            try:
+                if self._slots[name].__get__(self) in pks:
+                    return True
+            except AttributeError:
+                pass
+        return False
+
+    def __getattr__(self, name):
+        # Only reached when a slot has not been filled in; unset fields read as None.
+        if name in self._fields:
+            return None
+        raise AttributeError(f"{self.__class__.__name__!r} object has no attribute {name!r}")
 
     def __contains__(self, key):
         return key in self._components
 
-    def validate(self):
-        for component in self._components.values():
-            component.validate(self.__dict__)
-
-    def serialize(self):
+    def _data(self):
         data = {}
-        for _type, component in self._components.items():
-            data.update(component.serialize(self.__dict__))
+        for name, slot in self._slots.items():
+            try:
+                data[name] = slot.__get__(self)
+            except AttributeError:
+                pass
+        return data
+
+    def validate(self):
+        data = self._data()
+        token = fields.current_manager.set(self.manager)
+        try:
+            for component in self._components.values():
+                component.validate(data)
+        finally:
+            fields.current_manager.reset(token)
+
+    def serialize(self, strict=True):
+        # The slots are laid out in component and field order, so the data already is what
+        # serializing each component in turn would give.  Unless strict, only the components
+        # with fields written since the last validation are validated again.
+        data = self._data()
+        dirty = self._components if strict else self.dirty_components()
+        if dirty:
+            token = fields.current_manager.set(self.manager)
+            try:
+                for _type in dirty:
+                    self._components[_type].validate(data)
+            finally:
+                fields.current_manager.reset(token)
+        self._dirty = None
         return data
 
     @classmethod
     def register_manager(cls, manager):
-        cls.manager = weakref.proxy(manager)
+        """Makes `manager` the one creating entities through Entity(**data) in the current context.
+
+        The entity classes generated by a manager are bound to it, so this is only needed for
+        creating entities through the Entity base class, or validating data outside of an entity.
+        Entity.manager is then `manager`, while each generated class keeps its own.
+        """
+        fields.current_manager.set(weakref.proxy(manager))
 
 
 class Manager:
-    def __init__(self):
+    # The spatial index divides the width of the universe into this many cells along each axis.
+    GRID_CELLS = 50
+    DEFAULT_CELL_SIZE = 20
+
+    def __init__(self, width=None, fixed_point=False, strict=False, backend=None):
+        self.fixed_point = fixed_point
+        # Where the field data of the entities lives; see the storage module.
+        self.storage = backend if backend is not None else storage.SlotStorage()
+        # In strict mode every entity is fully validated again on export, changed or not.
+        self.strict = strict
+        self._removed = set()
+        # The pks of the entities in the last imported or exported state, which deltas build on.
+        self._baseline = set()
+
         self._seq = 0
         self._components = {}
         self._systems = []
         self._updates = []
+        # (species pk, update, reason) for each update rejected on import.
+        self.rejected_updates = []
+        self._spatial = spatial.GridIndex(max(width // self.GRID_CELLS, 1) if width else self.DEFAULT_CELL_SIZE)
+        self._ownership = indexes.OwnerIndex()
+        self._orders = indexes.OrderIndex()
 
         self._entity_registry = {}
+        self._field_registry = {}
+        self._entity_classes = {}
+        self._habitability = {}
 
     def register_system(self, system):
         self._systems.append(system)
@@ -74,6 +261,79 @@ class Manager:
             raise ValueError("{} is already a registered entity type.".format(name))
         _components.append(components.MetadataComponent())
         self._entity_registry[name] = {component._name: component for component in _components}
+        self._field_registry[name] = self._build_field_table(name)
+        self._entity_classes[name] = self._build_entity_class(name)
+
+    def _build_field_table(self, _type):
+        # Map both the attribute name and the stored data name of every field onto the field
+        # itself, so that entity attributes resolve with a single lookup.  The first component
+        # to claim a name wins, matching the order in which the components were registered.
+        table = {}
+        for component in self._entity_registry[_type].values():
+            for field in component._fields.values():
+                table.setdefault(field.data_name, field)
+                table.setdefault(field.name, field)
+        return table
+
+    def get_field_table(self, _type):
+        if _type not in self._field_registry:
+            self._field_registry[_type] = self._build_field_table(_type)
+        return self._field_registry[_type]
+
+    def _build_entity_class(self, _type):
+        table = self.get_field_table(_type)
+        data_names = tuple(dict.fromkeys(field.data_name for field in table.values()))
+        class_name = ''.join(part.title() for part in _type.split('_')) + 'Entity'
+
+        # The components to validate again when a field changes: those declaring it, and those
+        # with a validate method of their own, which may check it against their own fields.
+        custom = [component._name for component in self._entity_registry[_type].values()
+                  if not getattr(component.validate, 'compiled', False)]
+        field_components = {}
+        for component in self._entity_registry[_type].values():
+            for field in component._fields.values():
+                field_components.setdefault(field.data_name, [*custom]).append(component._name)
+
+        entity_cls = type(class_name, (Entity,), {
+            '__slots__': self.storage.slots(data_names),
+            'manager': weakref.proxy(self),
+            '_components': self._entity_registry[_type],
+            '_fields': table,
+            '_field_components': field_components,
+            '_references': tuple(name for name in data_names if isinstance(table[name], fields.Reference)),
+        })
+
+        # Plain fields are served directly by the storage backend, e.g. by slot members.  Fields
+        # that convert values or that are indexed get a descriptor wrapping the storage.
+        entity_cls._slots = self.storage.bind(entity_cls, _type, data_names)
+        indexed = {}
+        if 'position' in self._entity_registry[_type]:
+            position = self._entity_registry[_type]['position']
+            indexed.update({position._fields['x']: self._spatial, position._fields['y']: self._spatial})
+        if 'ownership' in self._entity_registry[_type]:
+            indexed[self._entity_registry[_type]['ownership']._fields['owner']] = self._ownership
+        if 'orders' in self._entity_registry[_type]:
+            orders = self._entity_registry[_type]['orders']
+            indexed.update({orders._fields['actor']: self._orders, orders._fields['seq']: self._orders})
+        for name, field in table.items():
+            index = indexed.get(field)
+            if name != field.data_name and index is not None:
+                descriptor = IndexedFieldDescriptor(field, entity_cls._slots[field.data_name], index)
+            elif name != field.data_name:
+                descriptor = FieldDescriptor(field, entity_cls._slots[field.data_name])
+            elif index is not None:
+                descriptor = IndexedDescriptor(field, entity_cls._slots[name], index)
+            elif type(field).to_data is not fields.Field.to_data:
+                descriptor = DataDescriptor(field, entity_cls._slots[name])
+            else:
+                continue
+            setattr(entity_cls, name, descriptor)
+        return entity_cls
+
+    def get_entity_class(self, _type):
+        if _type not in self._entity_classes:
+            self._entity_classes[_type] = self._build_entity_class(_type)
+        return self._entity_classes[_type]
 
     def get_entities(self, _type):
         return self._components.get(_type, {})
@@ -81,6 +341,54 @@ class Manager:
     def get_entity(self, _type, _id):
         return self._components.get(_type, {}).get(_id)
 
+    def get_entities_in_rect(self, x_min, y_min, x_max, y_max):
+        return self._spatial.in_rect(x_min, y_min, x_max, y_max)
+
+    def get_entities_in_radius(self, x, y, radius):
+        return self._spatial.in_radius(x, y, radius)
+
+    def get_nearest_entities(self, x, y, k=1):
+        return self._spatial.nearest(x, y, k)
+
+    def get_owned_entities(self, owner_id, _type):
+        """The entities with component `_type` owned by the entity `owner_id`, by pk."""
+        return self._ownership.owned(owner_id, _type)
+
+    def get_orders(self, actor_id):
+        """The orders of the entity `actor_id`, sorted by seq."""
+        return self._orders.queue(actor_id)
+
+    def get_order(self, actor_id, seq):
+        return self._orders.get(actor_id, seq)
+
+    def iter_order_queues(self):
+        """Yields (actor pk, iterator over its orders sorted by seq) for every actor with orders.
+
+        The orders are read from the index as they are iterated over, so the queues must not be
+        changed meanwhile.
+        """
+        return self._orders.queues()
+
+    def iter_values(self, _type, name):
+        """Yields (pk, value) for the entities with component `_type` that have field `name` set."""
+        return self.storage.iter_values(self, _type, name)
+
+    def get_arrays(self, _type, name):
+        """(pks, values) as NumPy int64 arrays, for the entities with component `_type` and an int64 in field `name`.
+
+        The values are as stored, e.g. the pks of references, in no particular order but the same
+        for both arrays, which are copies.
+        """
+        return self.storage.arrays(self, _type, name)
+
+    def get_habitability_table(self, species):
+        # Tables are keyed on the environment ranges themselves rather than on the species, so
+        # they cannot go stale as species change, and species with the same ranges share one.
+        ranges = utils.environment_ranges(species)
+        if ranges not in self._habitability:
+            self._habitability[ranges] = utils.HabitabilityTable(ranges)
+        return self._habitability[ranges]
+
     def set_entity(self, _type, entity):
         self._components.setdefault(_type, {})[entity.pk] = entity
 
@@ -89,76 +397,229 @@ class Manager:
 
     def register_entity(self, entity):
         if not isinstance(entity, Entity):
-            entity = Entity(**entity)
+            entity = self.get_entity_class(entity['type'])(**entity)
         if entity.pk is None:
             entity.pk = self._seq
             self._seq += 1
+        # Key every registry on the same pk object; storage backends may build a new one per read.
+        pk, registry = entity.pk, self._components
         for component in entity._components:
-            self.set_entity(component, entity)
+            registry.setdefault(component, {})[pk] = entity
+        if 'position' in entity:
+            self._spatial.insert(entity)
+        if 'ownership' in entity:
+            self._ownership.insert(entity)
+        if 'orders' in entity:
+            self._orders.insert(entity)
 
         return entity
 
+    def register_entities(self, entities):
+        """Registers each of `entities` in turn, as register_entity does, and returns them."""
+        classes = {}
+        registered = []
+        for entity in entities:
+            if not isinstance(entity, Entity):
+                _type = entity['type']
+                if _type not in classes:
+                    classes[_type] = self.get_entity_class(_type)
+                entity = classes[_type](**entity)
+            registered.append(self.register_entity(entity))
+        return registered
+
     def unregister_entity(self, entity):
         for component in entity._components:
             self.del_entity(component, entity)
+        self._spatial.remove(entity)
+        self._ownership.remove(entity)
+        self._orders.remove(entity)
+        self._removed.add(entity.pk)
         entity.pk = None
 
+    def validate_entities(self, entities=None):
+        """Validates the given entities, or all registered ones, reporting every error found.
+
+        The references between entities are collected while each entity is checked on its own,
+        then resolved together against the registered entities.
+        """
+        entities = self.get_entities('metadata').values() if entities is None else list(entities)
+
+        errors, references, spans = [], [], []
+        token = fields.deferred_references.set(references)
+        manager_token = fields.current_manager.set(weakref.proxy(self))
+        try:
+            for entity in entities:
+                start, data = len(references), entity._data()
+                for component in entity._components.values():
+                    try:
+                        component.validate(data)
+                    except exceptions.ValidationError as e:
+                        errors.append((entity.pk, e))
+                if len(references) > start:
+                    spans.append((entity.pk, start, len(references)))
+        finally:
+            fields.current_manager.reset(manager_token)
+            fields.deferred_references.reset(token)
+
+        # Most references point at a few entities, e.g. the species owning things.
+        registry, resolved = self.get_entities('metadata'), {}
+        for pk, start, end in spans:
+            for reference in references[start:end]:
+                if reference not in resolved:
+                    value, types, missing, wrong_type = reference
+                    resolved[reference] = fields.reference_error(registry.get(value), types, missing, wrong_type)
+                if resolved[reference] is not None:
+                    errors.append((pk, exceptions.ValidationError(resolved[reference])))
+
+        if errors:
+            errors.sort(key=lambda item: item[0])
+            raise exceptions.BulkValidationError(errors)
+
+        for entity in entities:
+            entity._dirty = None
+
     def process(self):
         for system_cls in self._systems:
             system = system_cls()
             system.process(self)
 
     def import_data(self, data, updates):
+        # The entities may be streamed in, e.g. by persistence.load_state, so that each one is
+        # registered as soon as it is decoded.  Validation waits until all of them are in place.
         if 'seq' in data:
             self._seq = data['seq']
         for entity in (data.get('entities') or ()):
             self.register_entity(entity)
+        if 'seq' in data:
+            # Headers following a stream of entities only become available once it is exhausted.
+            self._seq = max(self._seq, data['seq'])
+        self.validate_entities()
+        self._baseline = set(self.get_entities('metadata'))
+
+        # The updates of each species are filtered independently, then merged in the order of
+        # the species in `updates`.
+        for species_id, items in updates.items():
+            accepted, rejected = self._filter_updates(species_id, items)
+            self._updates.extend(accepted)
+            for item, reason in rejected:
+                logger.warning("Rejected update from species %r: %s %r", species_id, reason, item)
+                self.rejected_updates.append((species_id, item, reason))
+
+    def _filter_updates(self, species_id, items):
+        # Only reads the registries; the updates of one species never affect those of another.
+        if self.get_entity('species', species_id) is None:
+            return [], [(item, "species does not exist.") for item in items]
+
+        accepted, rejected = [], []
+        owned = self.get_owned_entities(species_id, 'metadata')
+        for item in items:
+            keys = systems.UpdateSystem.ACTIONS.get(item.get('action')) if isinstance(item, dict) else None
+            if keys is None:
+                rejected.append((item, "unknown action."))
+                continue
+            missing = [key for key in ('actor_id',) + keys if key not in item]
+            if missing:
+                rejected.append((item, f"missing {', '.join(map(repr, missing))}."))
+                continue
+            if item['action'] == 'create' and (not isinstance(item['type'], str)
+                                               or 'orders' not in self._entity_registry.get(item['type'], ())):
+                rejected.append((item, "type is not a type of order."))
+                continue
+            try:
+                actor = owned.get(item['actor_id'])
+                exists = actor is not None or self.get_entity('metadata', item['actor_id']) is not None
+            except TypeError:
+                actor, exists = None, False
+            if actor is None:
+                rejected.append((item, "actor is not owned by the species." if exists else "actor does not exist."))
+                continue
+            if actor.type not in ('ship', 'planet'):
+                rejected.append((item, "actor cannot be given orders."))
+                continue
+            accepted.append(item)
+        return accepted, rejected
+
+    def serialize_entities(self):
+        # Entities left untouched keep their validity, unless they refer to a removed entity.
+        removed, self._removed = self._removed, set()
         for entity in self.get_entities('metadata').values():
-            entity.validate()
-
-        for species_id, S in updates.items():
-            if self.get_entity('species', species_id) is None:
-                continue  # FIXME: we should log an error
-            for item in S:
-                actor = self.get_entity('metadata', item['actor_id'])
-                if actor is None:
-                    continue  # FIXME: we should log an error
-                if actor.type not in ('ship', 'planet'):
-                    continue
-                if actor.owner_id != species_id:
-                    continue
-                self._updates.append(item)
-
-    def export_data(self):
+            if removed and entity.references_any(removed):
+                entity._dirty = True
+            yield entity.serialize(strict=self.strict)
+
+    def export_delta(self):
+        """Exports the changes since the last import or delta export, for persistence.apply_delta.
+
+        Entities are listed in full if created, by pk if deleted, and otherwise by the fields
+        written to since then, as those set and those unset.  The data names of each type of
+        changed entity are listed in the order they are exported in, so that changed entities
+        can be rebuilt exactly as exported.
+        """
+        removed, self._removed = self._removed, set()
+        registry = self.get_entities('metadata')
+        created, changed, order = [], [], {}
+        for entity in registry.values():
+            if removed and entity.references_any(removed):
+                entity._dirty = True
+            names = entity.changed_fields()
+            if not names and not self.strict:
+                continue
+            data = entity.serialize(strict=self.strict)
+            if entity.pk not in self._baseline:
+                created.append(data)
+            elif names:
+                changed.append({
+                    'pk': entity.pk,
+                    'set': {name: data[name] for name in names if name in data},
+                    'unset': [name for name in names if name not in data],
+                })
+                if data['type'] not in order:
+                    order[data['type']] = list(entity._slots)
+
+        deleted = sorted(self._baseline.difference(registry))
+        self._baseline = set(registry)
+        return {'seq': self._seq, 'created': created, 'deleted': deleted, 'changed': changed, 'fields': order}
+
+    def export_data(self, stream=False):
+        entities = self.serialize_entities()
         return {
             'seq': self._seq,
-            'entities': [entity.serialize() for entity in self.get_entities('metadata').values()]
+            'entities': entities if stream else list(entities)
         }
 
 
 class GameState:
-    def __init__(self, state, updates):
+    def __init__(self, state, updates, vectorized=False, fixed_point=False, strict=False, columnar=False):
         self.old = state
         self.updates = updates
 
-        self.manager = Manager()
+        self.manager = Manager(width=state.get('width'), fixed_point=fixed_point, strict=strict,
+                               backend=storage.ColumnStorage() if columnar else None)
         self.manager.register_system(systems.UpdateSystem)
-        self.manager.register_system(systems.MovementSystem)
+        self.manager.register_system(systems.VectorizedMovementSystem if vectorized else systems.MovementSystem)
         self.manager.register_system(systems.MiningSystem)
         self.manager.register_system(systems.PopulationGrowthSystem)
 
-        self.manager.register_entity_type('species', [
+        self.register_entity_types(self.manager)
+        Entity.register_manager(self.manager)
+        self.load_data()
+
+        self.new = {}
+
+    @staticmethod
+    def register_entity_types(manager):
+        manager.register_entity_type('species', [
             components.SpeciesComponent(),
             components.SpeciesEnvironmentComponent(),
             components.SpeciesProductionComponent(),
         ])
-        self.manager.register_entity_type('ship', [
+        manager.register_entity_type('ship', [
             components.PositionComponent(),
             components.OwnershipComponent(),
             components.PopulationComponent(),
             components.MineralInventoryComponent(),
         ])
-        self.manager.register_entity_type('planet', [
+        manager.register_entity_type('planet', [
             components.PositionComponent(),
             components.EnvironmentComponent(),
             components.MineralConcentrationComponent(),
@@ -167,22 +628,28 @@ class GameState:
             components.OwnershipComponent(),
             components.PopulationComponent(),
         ])
-        self.manager.register_entity_type('movement_order', [
+        manager.register_entity_type('movement_order', [
             components.OrderComponent(),
             components.MovementComponent(),
         ])
-        Entity.register_manager(self.manager)
-        self.load_data()
-
-        self.new = {}
 
     def load_data(self):
         self.manager.import_data(self.old, self.updates)
 
-    def generate(self):
+    def generate(self, stream=False):
+        # With stream=True the entities of the new state are a generator serializing them one by
+        # one, to be written out with e.g. persistence.dump_state.
+        self.new_headers()
+        self.manager.process()
+        self.new.update(self.manager.export_data(stream=stream))
+
+        return self.new
+
+    def generate_delta(self):
+        # Like generate, but giving only the changes from the old state.
         self.new_headers()
         self.manager.process()
-        self.new.update(self.manager.export_data())
+        self.new.update(self.manager.export_delta())
 
         return self.new
 
@@ -4,5 +4,19 @@ class ValidationError(Exception):
     pass
 
 
+class BulkValidationError(ValidationError):
+    """Every validation error found across a set of entities, as a list of (pk, error) pairs."""
+
+    def __init__(self, errors):
+        super().__init__(errors)
+        self.errors = errors
+
+    def __str__(self):
+        if len(self.errors) == 1:
+            return str(self.errors[0][1])
+        return f"{len(self.errors)} validation errors:\n" + "\n".join(
+            f"  entity {pk}: {error}" for pk, error in self.errors)
+
+
 class empty(Exception):
     pass
@@ -1,6 +1,66 @@
+import threading
+
 from . import exceptions
 
 
+class ThreadVariable(threading.local):
+    """A value local to the current thread, with the get/set/reset interface of ContextVar.
+
+    contextvars is only available from Python 3.7 on.
+    """
+
+    def __init__(self, name, default=None):
+        self.name = name
+        self.value = default
+
+    def get(self):
+        return self.value
+
+    def set(self, value):
+        token, self.value = self.value, value
+        return token
+
+    def reset(self, token):
+        self.value = token
+
+
+# While this holds a list, reference checks are appended to it rather than performed, so that
+# Manager.validate_entities can resolve all of them at once after the per-entity checks.
+deferred_references = ThreadVariable('deferred_references')
+
+# The Manager that references are resolved against where no entity provides its own, e.g. in
+# the validation of the data of an entity.
+current_manager = ThreadVariable('current_manager')
+
+
+def reference_error(entity, types, missing=None, wrong_type=None):
+    if entity is None:
+        return missing
+    if types is not None and entity.type not in types:
+        return wrong_type
+    return None
+
+
+def check_reference(value, types, missing=None, wrong_type=None):
+    """Checks that `value` is the pk of an existing entity of one of `types`.
+
+    `missing` and `wrong_type` are the messages of the errors raised otherwise, with None
+    meaning that the corresponding case is not an error here.
+    """
+    deferred = deferred_references.get()
+    if deferred is not None:
+        deferred.append((value, types, missing, wrong_type))
+        return
+
+    error = reference_error(current_manager.get().get_entity('metadata', value), types, missing, wrong_type)
+    if error is not None:
+        raise exceptions.ValidationError(error)
+
+
+def _raise(message):
+    return f"raise ValidationError({message!r})"
+
+
 class Field:
     def __init__(self, required=True):
         self.required = required
@@ -10,7 +70,10 @@ class Field:
         return self.name
 
     def from_data(self, data):
-        return data.get(self.data_name)
+        return self.from_value(data.get(self.data_name))
+
+    def from_value(self, value, manager=None):
+        return value
 
     def to_data(self, value):
         return value
@@ -24,6 +87,18 @@ class Field:
         if self.required and self.data_name not in data:
             raise exceptions.ValidationError(f"{self.data_name!r} is required.")
 
+    def validation_source(self, ref):
+        """Returns the lines of Python code doing the same checks on `data` as `validate`.
+
+        These are inlined into the validators compiled for components by MetaComponent, with
+        `ref(obj)` giving a name by which the code may refer to `obj`.  Subclasses overriding
+        `validate` without overriding this have their `validate` called instead.
+        """
+        if not self.required:
+            return []
+        message = f"{self.data_name!r} is required."
+        return [f"if {self.data_name!r} not in data:", f"    {_raise(message)}"]
+
 
 class BooleanField(Field):
     def __init__(self):
@@ -35,6 +110,13 @@ class BooleanField(Field):
         if not isinstance(value, bool):
             raise exceptions.ValidationError(f"{self.data_name!r} must be a boolean.")
 
+    def validation_source(self, ref):
+        message = f"{self.data_name!r} must be a boolean."
+        return super().validation_source(ref) + [
+            f"if not isinstance(data[{self.data_name!r}], bool):",
+            f"    {_raise(message)}",
+        ]
+
 
 class IntField(Field):
     def __init__(self, min=None, max=None, **kwargs):
@@ -54,6 +136,20 @@ class IntField(Field):
         if self.max is not None and value > self.max:
             raise exceptions.ValidationError(f"{self.data_name!r} must be less than or equal to {self.max}.")
 
+    def validation_source(self, ref):
+        message = f"{self.data_name!r} must be an integer."
+        checks = ["if not isinstance(value, int):", f"    {_raise(message)}"]
+        if self.min is not None:
+            message = f"{self.data_name!r} must be greater than or equal to {self.min}."
+            checks += [f"if value < {ref(self.min)}:", f"    {_raise(message)}"]
+        if self.max is not None:
+            message = f"{self.data_name!r} must be less than or equal to {self.max}."
+            checks += [f"if value > {ref(self.max)}:", f"    {_raise(message)}"]
+        return super().validation_source(ref) + [
+            f"if {self.data_name!r} in data:",
+            f"    value = data[{self.data_name!r}]",
+        ] + ['    ' + line for line in checks]
+
 
 class CharField(Field):
     def validate(self, data):
@@ -64,6 +160,13 @@ class CharField(Field):
         if not isinstance(value, str):
             raise exceptions.ValidationError(f"{self.data_name!r} must be a string.")
 
+    def validation_source(self, ref):
+        message = f"{self.data_name!r} must be a string."
+        return super().validation_source(ref) + [
+            f"if {self.data_name!r} in data and not isinstance(data[{self.data_name!r}], str):",
+            f"    {_raise(message)}",
+        ]
+
 
 class PrimaryKey(Field):
     def __init__(self):
@@ -75,23 +178,30 @@ class PrimaryKey(Field):
         if not isinstance(value, int):
             raise exceptions.ValidationError(f"{self.name!r} must be an integer.")
 
+    def validation_source(self, ref):
+        message = f"{self.name!r} must be an integer."
+        return super().validation_source(ref) + [
+            f"if not isinstance(data[{self.name!r}], int):",
+            f"    {_raise(message)}",
+        ]
+
 
 class Reference(Field):
     def __init__(self, types=None, **kwargs):
         super().__init__(**kwargs)
-        self.types = types
+        self.types = tuple(types) if types is not None else None
+        self._errors = None
 
     @property
     def data_name(self):
         return f'{self.name}_id'
 
-    def from_data(self, data):
-        value = data.get(self.data_name)
+    def from_value(self, value, manager=None):
         if value is None:
             return None
-
-        from .engine import Entity
-        return Entity.manager.get_entity('metadata', value)
+        if manager is None:
+            manager = current_manager.get()
+        return manager.get_entity('metadata', value)
 
     def to_data(self, value):
         from .engine import Entity
@@ -109,9 +219,22 @@ class Reference(Field):
         if not isinstance(value, int):
             raise exceptions.ValidationError(f"{self.data_name!r} must be an integer.")
 
-        from .engine import Entity
-        entity = Entity.manager.get_entity('metadata', value)
-        if entity is None:
-            raise exceptions.ValidationError(f"{self.data_name!r} is not an existing entity.")
-        if self.types is not None and entity.type not in self.types:
-            raise exceptions.ValidationError(f"{self.data_name!r} cannot point to an entity of this type.")
+        check_reference(value, self.types, *self.errors)
+
+    def validation_source(self, ref):
+        message = f"{self.data_name!r} must be an integer."
+        return super().validation_source(ref) + [
+            f"if {self.data_name!r} in data:",
+            f"    value = data[{self.data_name!r}]",
+            "    if not isinstance(value, int):",
+            f"        {_raise(message)}",
+            f"    {ref(check_reference)}(value, {ref(self.types)}, *{ref(self.errors)})",
+        ]
+
+    @property
+    def errors(self):
+        # Built on first use, as the field is only named once its component class is created.
+        if self._errors is None:
+            self._errors = (f"{self.data_name!r} is not an existing entity.",
+                            f"{self.data_name!r} cannot point to an entity of this type.")
+        return self._errors
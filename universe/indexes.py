@@ -0,0 +1,156 @@
+from bisect import bisect_left, insort
+
+
+class OwnerIndex:
+    """The entities of each owner, by component, for per-owner queries.
+
+    Entities are filed under the pk of their owner for each of their components, and are
+    moved between owners as their owner changes.
+    """
+
+    def __init__(self):
+        self._owners = {}
+        self._entities = {}
+
+    def __len__(self):
+        return sum(len(bucket.get('metadata', ())) for bucket in self._owners.values())
+
+    def __contains__(self, entity):
+        return entity.pk in self._entities
+
+    def _entity_owner(self, entity):
+        # Entities without an owner, or with one that fails validation, stay tracked but are not
+        # filed under any owner until it is set again.
+        owner = entity.owner_id
+        try:
+            hash(owner)
+        except TypeError:
+            return None
+        return owner
+
+    def _place(self, entity):
+        owner, pk = self._entity_owner(entity), entity.pk
+        if owner is not None:
+            buckets = self._owners.setdefault(owner, {})
+            for component in entity._components:
+                buckets.setdefault(component, {})[pk] = entity
+        self._entities[pk] = owner
+
+    def _unplace(self, entity):
+        owner = self._entities.pop(entity.pk, None)
+        if owner is None:
+            return
+        buckets = self._owners[owner]
+        for component in entity._components:
+            bucket = buckets[component]
+            del bucket[entity.pk]
+            if not bucket:
+                del buckets[component]
+        if not buckets:
+            del self._owners[owner]
+
+    def insert(self, entity):
+        self._unplace(entity)
+        self._place(entity)
+
+    def remove(self, entity):
+        self._unplace(entity)
+
+    def move(self, entity):
+        if entity.pk not in self._entities:
+            return
+        if self._entity_owner(entity) != self._entities[entity.pk]:
+            self._unplace(entity)
+            self._place(entity)
+
+    def owned(self, owner, _type):
+        return self._owners.get(owner, {}).get(_type, {})
+
+
+class OrderIndex:
+    """The orders of each actor, kept sorted by seq.
+
+    Each queue is a sorted list of (seq, pk) keys, so that orders are found, inserted and
+    removed by bisection, and are moved within or between queues as their actor or seq changes.
+    Orders with the same seq are kept in pk order.
+    """
+
+    def __init__(self):
+        self._queues = {}
+        self._orders = {}
+        self._entities = {}
+
+    def __len__(self):
+        return sum(len(keys) for keys in self._queues.values())
+
+    def __contains__(self, entity):
+        return entity.pk in self._entities
+
+    def _entity_key(self, entity):
+        # Orders missing their actor or seq, or with one that fails validation, stay tracked but
+        # are not in any queue until it is set again.
+        actor, seq = entity.actor_id, entity.seq
+        if type(actor) is not int or type(seq) is not int:
+            return None
+        return actor, (seq, entity.pk)
+
+    def _place(self, entity):
+        key = self._entity_key(entity)
+        if key is not None:
+            insort(self._queues.setdefault(key[0], []), key[1])
+            self._orders[key[1][1]] = entity
+            self._entities[key[1][1]] = key
+        else:
+            self._entities[entity.pk] = key
+
+    def _unplace(self, pk):
+        key = self._entities.pop(pk, None)
+        if key is None:
+            return
+        keys = self._queues[key[0]]
+        del keys[bisect_left(keys, key[1])]
+        if not keys:
+            del self._queues[key[0]]
+        del self._orders[pk]
+
+    def insert(self, entity):
+        self._unplace(entity.pk)
+        self._place(entity)
+
+    def remove(self, entity):
+        self._unplace(entity.pk)
+
+    def move(self, entity):
+        if entity.pk not in self._entities:
+            return
+        old, new = self._entities[entity.pk], self._entity_key(entity)
+        if new == old:
+            return
+        if old is not None and new is not None and old[0] == new[0]:
+            # Renumbering an order without passing any other, e.g. when its queue advances.
+            keys = self._queues[old[0]]
+            i = bisect_left(keys, old[1])
+            if (i == 0 or keys[i - 1] < new[1]) and (i == len(keys) - 1 or new[1] < keys[i + 1]):
+                keys[i] = new[1]
+                self._entities[entity.pk] = new
+                return
+        self._unplace(entity.pk)
+        self._place(entity)
+
+    def get(self, actor, seq):
+        if type(seq) is not int:
+            return None
+        keys = self._queues.get(actor, ())
+        i = bisect_left(keys, (seq,))
+        if i < len(keys) and keys[i][0] == seq:
+            return self._orders[keys[i][1]]
+        return None
+
+    def queue(self, actor):
+        orders = self._orders
+        return [orders[pk] for seq, pk in self._queues.get(actor, ())]
+
+    def queues(self):
+        orders = self._orders
+        for actor, keys in self._queues.items():
+            yield actor, (orders[pk] for seq, pk in keys)
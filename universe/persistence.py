@@ -0,0 +1,172 @@
+import json
+
+
+CHUNK_SIZE = 64 * 1024
+NUMBER_CHARS = '0123456789+-.eE'
+
+
+class JSONStream:
+    """Decodes JSON values one at a time from a text file, reading it in chunks."""
+
+    def __init__(self, fp, chunk_size=CHUNK_SIZE):
+        self.fp = fp
+        self.chunk_size = chunk_size
+        self.decoder = json.JSONDecoder()
+        self.buffer, self.pos, self.eof = '', 0, False
+
+    def _fill(self):
+        chunk = self.fp.read(self.chunk_size)
+        if not chunk:
+            self.eof = True
+            return False
+        self.buffer = self.buffer[self.pos:] + chunk
+        self.pos = 0
+        return True
+
+    def peek(self):
+        while True:
+            while self.pos < len(self.buffer) and self.buffer[self.pos].isspace():
+                self.pos += 1
+            if self.pos < len(self.buffer) or not self._fill():
+                return self.buffer[self.pos:self.pos + 1]
+
+    def expect(self, char):
+        found = self.peek()
+        if found != char:
+            raise json.JSONDecodeError(f"Expecting {char!r}", self.buffer, self.pos)
+        self.pos += 1
+
+    def value(self):
+        while True:
+            self.peek()
+            try:
+                value, end = self.decoder.raw_decode(self.buffer, self.pos)
+            except json.JSONDecodeError:
+                if self._fill():
+                    continue
+                raise
+            # A number running up to the end of the buffer may continue in the next chunk, e.g.
+            # '1' or '1e-' read from '1e-5'.  Anything else is complete once decoded.
+            if (type(value) in (int, float) and len(self.buffer) - end <= 2
+                    and not self.buffer[end:].strip(NUMBER_CHARS) and self._fill()):
+                continue
+            self.pos = end
+            return value
+
+    def array(self):
+        """Yields the items of a JSON array as they are decoded."""
+        self.expect('[')
+        if self.peek() == ']':
+            self.pos += 1
+            return
+        while True:
+            yield self.value()
+            if self.peek() == ']':
+                self.pos += 1
+                return
+            self.expect(',')
+
+
+def load_state(fp, chunk_size=CHUNK_SIZE):
+    """Reads a game state saved as a JSON object, without loading all of its entities at once.
+
+    The returned state has its 'entities' as a generator decoding them one by one from `fp`,
+    which therefore has to stay open until they have been consumed.  Any keys following the
+    entities in the file are added to the state once the generator is exhausted.
+    """
+    stream = JSONStream(fp, chunk_size)
+    state = {}
+
+    def entities():
+        yield from stream.array()
+        while stream.peek() == ',':
+            stream.pos += 1
+            read_item()
+        stream.expect('}')
+
+    def read_item():
+        key = stream.value()
+        stream.expect(':')
+        if key == 'entities':
+            state[key] = entities()
+            return True
+        state[key] = stream.value()
+        return False
+
+    stream.expect('{')
+    if stream.peek() == '}':
+        stream.pos += 1
+        return state
+    while not read_item():
+        if stream.peek() == '}':
+            stream.pos += 1
+            break
+        stream.expect(',')
+    return state
+
+
+def load_state_lines(fp):
+    """Reads a game state saved as JSON Lines: the state headers first, then one entity per line."""
+    state = json.loads(fp.readline())
+    state['entities'] = (json.loads(line) for line in fp if line.strip())
+    return state
+
+
+def apply_delta(state, delta):
+    """Rebuilds the full state following `state` from the delta exported for it.
+
+    The delta is as produced by `GameState.generate_delta`, and the result is equal to what
+    `GameState.generate` would have produced instead.  Changed entities are rebuilt with their
+    fields in the order of the export; as long as the entities of `state` are in that order too,
+    e.g. as exported by a previous turn, the result also serializes to the same JSON text.
+    `state` itself is left unchanged.
+    """
+    deleted = set(delta['deleted'])
+    changes = {change['pk']: change for change in delta['changed']}
+    order = delta.get('fields', {})
+
+    entities = []
+    for entity in state.get('entities', ()):
+        if entity['pk'] in deleted:
+            continue
+        if entity['pk'] in changes:
+            change = changes[entity['pk']]
+            entity = {key: value for key, value in entity.items() if key not in change['unset']}
+            entity.update(change['set'])
+            names = order.get(entity['type'], ())
+            entity = {**{name: entity[name] for name in names if name in entity}, **entity}
+        entities.append(entity)
+    entities.extend(delta['created'])
+
+    new = {key: value for key, value in delta.items() if key not in ('created', 'deleted', 'changed', 'fields')}
+    new['entities'] = entities
+    return new
+
+
+def dump_state(state, fp):
+    """Writes a game state to `fp` one entity at a time, exactly as `json.dump(state, fp)` would.
+
+    The state's 'entities' may be any iterable, e.g. from `GameState.generate(stream=True)`.
+    """
+    fp.write('{')
+    for i, (key, value) in enumerate(state.items()):
+        if i:
+            fp.write(', ')
+        fp.write(json.dumps(key) + ': ')
+        if key != 'entities':
+            fp.write(json.dumps(value))
+            continue
+        fp.write('[')
+        for j, entity in enumerate(value):
+            if j:
+                fp.write(', ')
+            fp.write(json.dumps(entity))
+        fp.write(']')
+    fp.write('}')
+
+
+def dump_state_lines(state, fp):
+    """Writes a game state to `fp` as JSON Lines, in the layout read by `load_state_lines`."""
+    fp.write(json.dumps({key: value for key, value in state.items() if key != 'entities'}) + '\n')
+    for entity in state.get('entities', ()):
+        fp.write(json.dumps(entity) + '\n')
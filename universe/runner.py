@@ -0,0 +1,146 @@
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import argparse
+import json
+import logging
+import os
+import tempfile
+import time
+
+from . import engine, persistence
+
+
+logger = logging.getLogger(__name__)
+
+# Each game is a directory holding its current state, and optionally the updates submitted by
+# the players as a mapping of species pk to a list of updates.  The new state replaces the
+# current one, or is written to a directory of the same name under the output directory.
+# Updates applied in place are then renamed after the turn they were applied to, so that
+# running again generates the following turn without them.
+STATE_FILE = 'state.json'
+UPDATES_FILE = 'updates.json'
+APPLIED_UPDATES_FILE = 'updates-{turn}.json'
+
+
+def find_games(root):
+    """The game directories directly under `root`, by name."""
+    return sorted(entry.path for entry in os.scandir(root)
+                  if entry.is_dir() and os.path.exists(os.path.join(entry.path, STATE_FILE)))
+
+
+def load_updates(path):
+    if not os.path.exists(path):
+        return {}
+    with open(path) as fp:
+        updates = json.load(fp)
+    # JSON object keys are strings, while the species are keyed by their integer pks.
+    return {int(species_id): items for species_id, items in updates.items()}
+
+
+def _file_mode(path):
+    # The mode of `path` if it exists, else that of a file created by open(), i.e. rw masked by the umask.
+    try:
+        return os.stat(path).st_mode & 0o7777
+    except FileNotFoundError:
+        umask = os.umask(0)
+        os.umask(umask)
+        return 0o666 & ~umask
+
+
+def write_atomically(path, write):
+    """Calls `write` with a text file that replaces `path` once `write` has returned.
+
+    Readers of `path` see either the old or the new file in full, never a partial one.  The
+    new file keeps the permissions of the old one.
+    """
+    directory = os.path.dirname(path) or '.'
+    os.makedirs(directory, exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(dir=directory, prefix='.' + os.path.basename(path), suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'w') as fp:
+            write(fp)
+            fp.flush()
+            os.fsync(fp.fileno())
+        # mkstemp creates the file readable by its owner only.
+        os.chmod(temp_path, _file_mode(path))
+        os.replace(temp_path, path)
+    except BaseException:
+        os.unlink(temp_path)
+        raise
+
+
+def run_game(path, output=None, **options):
+    """Generates the next turn of the game in directory `path`, and reports how it went.
+
+    `options` are passed on to GameState.  Returns a dict of the game, its new turn, the number
+    of updates rejected, the seconds taken and the error raised, if any; errors are reported
+    rather than raised, so that one broken game does not hold up the others.
+    """
+    name = os.path.basename(os.path.normpath(path))
+    target = os.path.join(output, name, STATE_FILE) if output is not None else os.path.join(path, STATE_FILE)
+    start = time.perf_counter()
+    result = {'game': name, 'turn': None, 'rejected': None, 'seconds': None, 'error': None}
+    try:
+        updates_path = os.path.join(path, UPDATES_FILE)
+        updates = load_updates(updates_path)
+        with open(os.path.join(path, STATE_FILE)) as fp:
+            game = engine.GameState(persistence.load_state(fp), updates, **options)
+        new = game.generate(stream=True)
+        write_atomically(target, lambda fp: persistence.dump_state(new, fp))
+        if output is None and os.path.exists(updates_path):
+            os.replace(updates_path, os.path.join(path, APPLIED_UPDATES_FILE.format(turn=game.old['turn'])))
+        result['turn'], result['rejected'] = new['turn'], len(game.manager.rejected_updates)
+    except Exception as e:
+        logger.exception("Failed to generate game %r", name)
+        result['error'] = f"{type(e).__name__}: {e}"
+    result['seconds'] = time.perf_counter() - start
+    return result
+
+
+def run_games(paths, output=None, workers=None, **options):
+    """Generates the next turn of each game in `paths`, on a pool of `workers` processes.
+
+    The worker processes are reused across games, so each imports the package only once.
+    With `workers` of 1 the games are generated in this process instead.  The results of
+    run_game are returned in the order of `paths`.
+    """
+    paths = list(paths)
+    if workers == 1 or len(paths) <= 1:
+        return [run_game(path, output, **options) for path in paths]
+
+    results = {}
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {executor.submit(run_game, path, output, **options): path for path in paths}
+        for future in as_completed(futures):
+            results[futures[future]] = result = future.result()
+            logger.info("Generated game %r in %.3fs", result['game'], result['seconds'])
+    return [results[path] for path in paths]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='universe',
+                                     description="Generate the next turn of every game in a directory.")
+    parser.add_argument('root', help="directory holding one directory per game")
+    parser.add_argument('-j', '--workers', type=int, default=None,
+                        help="number of worker processes (default: the number of CPUs)")
+    parser.add_argument('-o', '--output', default=None,
+                        help="directory to write the new states to (default: replace each game's state, "
+                             "and set its updates aside)")
+    parser.add_argument('--vectorized', action='store_true', help="use the NumPy movement system")
+    parser.add_argument('--fixed-point', action='store_true', help="use integer arithmetic for growth and mining")
+    parser.add_argument('--strict', action='store_true', help="fully validate every entity on export")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.WARNING, format='%(levelname)s %(name)s: %(message)s')
+    start = time.perf_counter()
+    results = run_games(find_games(args.root), args.output, args.workers, vectorized=args.vectorized,
+                        fixed_point=args.fixed_point, strict=args.strict)
+
+    for result in results:
+        if result['error'] is None:
+            status = f"turn {result['turn']}, {result['rejected']} updates rejected"
+        else:
+            status = f"failed: {result['error']}"
+        print(f"{result['game']}\t{result['seconds']:.3f}s\t{status}")
+    failed = sum(result['error'] is not None for result in results)
+    print(f"{len(results) - failed} of {len(results)} games generated in {time.perf_counter() - start:.3f}s")
+    return 1 if failed else 0
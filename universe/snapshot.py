@@ -0,0 +1,577 @@
+"""Binary snapshots of game states.
+
+A snapshot stores the entities of each type as a section of columns, one per field, which
+makes it both smaller and faster to read and write than the equivalent JSON.  All numbers
+are little-endian, and every column starts on an 8-byte boundary so that it can be used in
+place from a memory map.
+
+    b'UNIVSNAP', u32 version
+    u32 header count, then for each header: string key, u8 kind, value
+    u32 section count, then for each entity type:
+        string type, u64 rows, u32 columns, then for each field:
+            string name, u8 kind, padding, one presence byte per row, padding, values
+    u64 entity count, padding, then (u32 section, u32 row) for each entity, in state order
+
+Strings are a u32 byte length followed by their UTF-8 encoding.  The kind of a column is the
+ASCII code of one of the KIND_* constants below.  Integers are stored in the narrowest of
+int8, int16, int32 or int64 holding all of the column, booleans as one byte each, and strings
+or anything else (encoded as JSON) as u64 end offsets into a blob of their UTF-8 encodings.
+"""
+import json
+import mmap
+import struct
+import sys
+from array import array
+from collections.abc import Mapping
+
+
+MAGIC = b'UNIVSNAP'
+VERSION = 1
+
+# The integer kinds are named after their array typecodes.
+KIND_INTS = {'b': 1, 'h': 2, 'i': 4, 'q': 8}
+KIND_BOOL = '?'
+KIND_STR = 's'
+KIND_JSON = 'j'
+
+
+def _array(typecode, data):
+    values = array(typecode)
+    values.frombytes(data)
+    if sys.byteorder == 'big':
+        values.byteswap()
+    return values
+
+
+def _bytes(values):
+    if sys.byteorder == 'big':
+        values = array(values.typecode, values)
+        values.byteswap()
+    return values.tobytes()
+
+
+def _kind(values):
+    types = set(map(type, values))
+    if types == {bool}:
+        return KIND_BOOL
+    if types == {int}:
+        low, high = min(values), max(values)
+        for kind, size in KIND_INTS.items():
+            if -2 ** (8 * size - 1) <= low and high < 2 ** (8 * size - 1):
+                return kind
+    if types == {str}:
+        return KIND_STR
+    return KIND_JSON
+
+
+class Writer:
+    def __init__(self):
+        self.out = bytearray()
+
+    def pad(self):
+        self.out.extend(bytes(-len(self.out) % 8))
+
+    def pack(self, fmt, *values):
+        self.out.extend(struct.pack('<' + fmt, *values))
+
+    def string(self, value):
+        data = value.encode('utf-8')
+        self.pack('I', len(data))
+        self.out.extend(data)
+
+    def values(self, kind, values):
+        if kind in KIND_INTS:
+            self.out.extend(_bytes(array(kind, values)))
+        elif kind == KIND_BOOL:
+            self.out.extend(bytes(values))
+        else:
+            if kind == KIND_JSON:
+                values = [json.dumps(value) for value in values]
+            blobs = [value.encode('utf-8') for value in values]
+            ends, end = array('Q'), 0
+            for blob in blobs:
+                end += len(blob)
+                ends.append(end)
+            self.out.extend(_bytes(ends))
+            self.out.extend(b''.join(blobs))
+
+    def column(self, name, rows):
+        present = [name in row for row in rows]
+        values = [row[name] for row in rows if name in row]
+        kind = _kind(values)
+        if kind in KIND_INTS or kind == KIND_BOOL:
+            # Absent values are stored as zeroes, keeping the values aligned with the rows.
+            values = [row.get(name, 0) for row in rows]
+
+        self.string(name)
+        self.pack('c', kind.encode())
+        self.pad()
+        self.out.extend(bytes(present))
+        self.pad()
+        self.values(kind, values)
+
+
+class Reader:
+    def __init__(self, data):
+        self.data = memoryview(data)
+        self.pos = 0
+
+    def align(self):
+        self.pos += -self.pos % 8
+
+    def take(self, size):
+        chunk = self.data[self.pos:self.pos + size]
+        if len(chunk) != size:
+            raise ValueError("Truncated snapshot.")
+        self.pos += size
+        return chunk
+
+    def unpack(self, fmt):
+        fmt = '<' + fmt
+        values = struct.unpack_from(fmt, self.take(struct.calcsize(fmt)))
+        return values[0] if len(values) == 1 else values
+
+    def string(self):
+        return str(self.take(self.unpack('I')), 'utf-8')
+
+    def values(self, kind, count):
+        if kind in KIND_INTS:
+            return _array(kind, self.take(KIND_INTS[kind] * count)).tolist()
+        if kind == KIND_BOOL:
+            return [bool(value) for value in self.take(count)]
+        ends = _array('Q', self.take(8 * count))
+        blob = self.take(ends[-1] if count else 0)
+        values, start = [], 0
+        for end in ends:
+            values.append(str(blob[start:end], 'utf-8'))
+            start = end
+        if kind == KIND_JSON:
+            values = [json.loads(value) for value in values]
+        elif kind != KIND_STR:
+            raise ValueError(f"Unknown column kind {kind!r}.")
+        return values
+
+    def skip(self, kind, count):
+        if kind in KIND_INTS:
+            self.take(KIND_INTS[kind] * count)
+        elif kind == KIND_BOOL:
+            self.take(count)
+        else:
+            ends = self.take(8 * count)
+            self.take(struct.unpack_from('<Q', ends, 8 * (count - 1))[0] if count else 0)
+
+    def column(self, rows):
+        name = self.string()
+        kind = self.unpack('c').decode()
+        self.align()
+        present = bytes(self.take(rows))
+        self.align()
+        if kind in KIND_INTS or kind == KIND_BOOL:
+            values = self.values(kind, rows)
+        else:
+            # Only the present values are stored; spread them back out over the rows.
+            stored = iter(self.values(kind, sum(present)))
+            values = [next(stored) if flag else None for flag in present]
+        return name, present, values
+
+
+def _field_order(rows):
+    # The fields of a type in an order consistent with that of each of its entities, favouring
+    # the order in which they first appear.  Every pair of consecutive fields of an entity must
+    # keep its order, so sort the fields topologically under that relation.
+    first, following, preceding = {}, {}, {}
+    for keys in dict.fromkeys(tuple(row) for row in rows):
+        for i, name in enumerate(keys):
+            first.setdefault(name, len(first))
+            following.setdefault(name, set())
+            preceding.setdefault(name, 0)
+            if i and name not in following[keys[i - 1]]:
+                following[keys[i - 1]].add(name)
+                preceding[name] += 1
+
+    ready = [name for name in first if not preceding[name]]
+    order = []
+    while ready:
+        name = min(ready, key=first.get)
+        ready.remove(name)
+        order.append(name)
+        for successor in following[name]:
+            preceding[successor] -= 1
+            if not preceding[successor]:
+                ready.append(successor)
+    # Entities disagreeing on the order of their fields come back with some of them reordered.
+    return order + [name for name in first if name not in order]
+
+
+def _rows(count, columns):
+    # Transpose the columns back into entities, then drop the fields absent from each.
+    names = [name for name, present, values in columns]
+    rows = [dict(zip(names, values)) for values in zip(*(values for name, present, values in columns))]
+    if not columns:
+        rows = [{} for _ in range(count)]
+    for name, present, values in columns:
+        if not all(present):
+            for row, flag in zip(rows, present):
+                if not flag:
+                    del row[name]
+    return rows
+
+
+def dumps(state):
+    """Encodes a game state, as given by `GameState.generate`, as a snapshot."""
+    sections, index, order = {}, {}, array('I')
+    for entity in state.get('entities', ()):
+        if entity['type'] not in sections:
+            sections[entity['type']], index[entity['type']] = [], len(sections)
+        rows = sections[entity['type']]
+        order.extend((index[entity['type']], len(rows)))
+        rows.append(entity)
+
+    writer = Writer()
+    writer.out.extend(MAGIC)
+    writer.pack('I', VERSION)
+
+    headers = {key: value for key, value in state.items() if key != 'entities'}
+    writer.pack('I', len(headers))
+    for key, value in headers.items():
+        kind = _kind([value])
+        writer.string(key)
+        writer.pack('c', kind.encode())
+        writer.values(kind, [value])
+
+    writer.pack('I', len(sections))
+    for _type, rows in sections.items():
+        writer.string(_type)
+        fields = _field_order(rows)
+        writer.pack('QI', len(rows), len(fields))
+        for name in fields:
+            writer.column(name, rows)
+
+    writer.pack('Q', len(order) // 2)
+    writer.pad()
+    writer.out.extend(_bytes(order))
+    return bytes(writer.out)
+
+
+def dump(state, fp):
+    fp.write(dumps(state))
+
+
+def _read(data):
+    reader = Reader(data)
+    if bytes(reader.take(len(MAGIC))) != MAGIC:
+        raise ValueError("Not a snapshot.")
+    version = reader.unpack('I')
+    if version != VERSION:
+        raise ValueError(f"Unsupported snapshot version {version}.")
+
+    headers = {}
+    for _ in range(reader.unpack('I')):
+        key = reader.string()
+        headers[key] = reader.values(reader.unpack('c').decode(), 1)[0]
+
+    sections = []
+    for _ in range(reader.unpack('I')):
+        _type = reader.string()
+        rows, count = reader.unpack('QI')
+        sections.append((_type, rows, [reader.column(rows) for _ in range(count)]))
+
+    count = reader.unpack('Q')
+    reader.align()
+    order = _array('I', reader.take(8 * count))
+    return headers, sections, order
+
+
+def _in_order(sections, order):
+    for i in range(0, len(order), 2):
+        yield sections[order[i]][order[i + 1]]
+
+
+def loads(data):
+    """Decodes a snapshot into a game state, with its entities as a generator."""
+    headers, sections, order = _read(data)
+    headers['entities'] = _in_order([_rows(rows, columns) for _type, rows, columns in sections], order)
+    return headers
+
+
+def load(fp):
+    return loads(fp.read())
+
+
+def load_manager(manager, data, updates=None):
+    """Imports a snapshot into `manager`, filling in its entities column by column.
+
+    Returns the headers of the snapshot's state.
+    """
+    headers, sections, order = _read(data)
+
+    built = []
+    for _type, rows, columns in sections:
+        entity_cls = manager.get_entity_class(_type)
+        entities = [entity_cls() for _ in range(rows)]
+        for name, present, values in columns:
+            # Store the values as they are, as Entity(**data) would; validation follows on import.
+            slot = entity_cls._slots.get(name)
+            for entity, flag, value in zip(entities, present, values):
+                if not flag:
+                    continue
+                if slot is not None:
+                    slot.__set__(entity, value)
+                else:
+                    setattr(entity, name, value)
+        built.append(entities)
+
+    manager.import_data(dict(headers, entities=_in_order(built, order)), updates or {})
+    return headers
+
+
+class Column:
+    """The values of one field for the entities of one type, read from a snapshot as accessed."""
+
+    def __init__(self, archive, kind, rows, present, start, stored):
+        self.archive = archive
+        self.kind = kind
+        self.rows = rows
+        self.present = present
+        self.start = start
+        self.stored = stored
+        self._values = None
+        self._ranks = None
+
+    def _view(self, typecode, start, size):
+        view = self.archive._view(start, size)
+        if sys.byteorder == 'little':
+            return self.archive._track(view.cast(typecode))
+        return _array(typecode, view)
+
+    @property
+    def values(self):
+        if self._values is None:
+            if self.kind in KIND_INTS:
+                self._values = self._view(self.kind, self.start, KIND_INTS[self.kind] * self.rows)
+            elif self.kind == KIND_BOOL:
+                self._values = self.archive._view(self.start, self.rows)
+            else:
+                ends = self._view('Q', self.start, 8 * self.stored)
+                blob = self.archive._view(self.start + 8 * self.stored, ends[-1] if self.stored else 0)
+                self._values = (ends, blob)
+        return self._values
+
+    def _decode(self, index):
+        ends, blob = self.values
+        value = str(blob[ends[index - 1] if index else 0:ends[index]], 'utf-8')
+        return json.loads(value) if self.kind == KIND_JSON else value
+
+    def __getitem__(self, row):
+        if not self.present[row]:
+            return None
+        if self.kind in KIND_INTS:
+            return self.values[row]
+        if self.kind == KIND_BOOL:
+            return bool(self.values[row])
+        if self._ranks is None:
+            # Only the present values are stored, so map each row to its value's position.
+            self._ranks = array('q')
+            rank = 0
+            for flag in self.present:
+                self._ranks.append(rank)
+                rank += flag
+        return self._decode(self._ranks[row])
+
+    def __iter__(self):
+        """Yields the value of each row, or None for the rows where it is not set."""
+        if self.kind in KIND_INTS:
+            for flag, value in zip(self.present, self.values):
+                yield value if flag else None
+        elif self.kind == KIND_BOOL:
+            for flag, value in zip(self.present, self.values):
+                yield bool(value) if flag else None
+        else:
+            index = 0
+            for flag in self.present:
+                if flag:
+                    yield self._decode(index)
+                    index += 1
+                else:
+                    yield None
+
+
+class Section:
+    """The entities of one type in a snapshot."""
+
+    def __init__(self, _type, rows, columns, manager):
+        self.type = _type
+        self.rows = rows
+        self.columns = columns
+        self.components = manager._entity_registry.get(_type, {})
+        self.fields = manager.get_field_table(_type) if _type in manager._entity_registry else {}
+        self._index = None
+
+    def pks(self):
+        return self.columns['pk']
+
+    @property
+    def index(self):
+        if self._index is None:
+            self._index = {pk: row for row, pk in enumerate(self.pks())}
+        return self._index
+
+
+class Row:
+    """A read-only view of an entity in a snapshot, with the attributes of an Entity."""
+
+    __slots__ = ('_archive', '_section', '_row')
+
+    def __init__(self, archive, section, row):
+        self._archive = archive
+        self._section = section
+        self._row = row
+
+    def __getattr__(self, name):
+        field = self._section.fields.get(name)
+        if field is None:
+            raise AttributeError(f"{self.__class__.__name__!r} object has no attribute {name!r}")
+        column = self._section.columns.get(field.data_name)
+        value = column[self._row] if column is not None else None
+        if name != field.data_name:
+            return self._archive.get_entity('metadata', value) if value is not None else None
+        return value
+
+    def __contains__(self, key):
+        return key in self._section.components
+
+    def __eq__(self, other):
+        return isinstance(other, Row) and (self._section, self._row) == (other._section, other._row)
+
+    def __hash__(self):
+        return hash((id(self._section), self._row))
+
+    def __repr__(self):
+        return f"<Row {self._section.type} {self.pk}>"
+
+
+class EntityView(Mapping):
+    """The entities of a snapshot having a given component, by pk, as from Manager.get_entities."""
+
+    def __init__(self, archive, sections):
+        self._archive = archive
+        self._sections = sections
+
+    def __getitem__(self, pk):
+        for section in self._sections:
+            row = section.index.get(pk)
+            if row is not None:
+                return Row(self._archive, section, row)
+        raise KeyError(pk)
+
+    def __iter__(self):
+        for section in self._sections:
+            yield from section.pks()
+
+    def __len__(self):
+        return sum(section.rows for section in self._sections)
+
+    def values(self):
+        for section in self._sections:
+            for row in range(section.rows):
+                yield Row(self._archive, section, row)
+
+    def items(self):
+        for section in self._sections:
+            for row, pk in enumerate(section.pks()):
+                yield pk, Row(self._archive, section, row)
+
+
+class Archive:
+    """Read-only access to the entities of a snapshot, without building any Entity.
+
+    Values are read from the columns of the snapshot as they are accessed, so that scanning a
+    few fields over many archived turns only touches those columns.  `manager` provides the
+    components of each entity type, e.g. one set up by GameState.register_entity_types.  Use
+    Archive.open to memory-map a snapshot file.
+    """
+
+    def __init__(self, data, manager):
+        self._buffer = memoryview(data)
+        self._views = []
+        self._mmap = None
+
+        reader = Reader(self._buffer)
+        if bytes(reader.take(len(MAGIC))) != MAGIC:
+            raise ValueError("Not a snapshot.")
+        version = reader.unpack('I')
+        if version != VERSION:
+            raise ValueError(f"Unsupported snapshot version {version}.")
+
+        self.headers = {}
+        for _ in range(reader.unpack('I')):
+            key = reader.string()
+            self.headers[key] = reader.values(reader.unpack('c').decode(), 1)[0]
+
+        self._sections = []
+        for _ in range(reader.unpack('I')):
+            _type = reader.string()
+            rows, count = reader.unpack('QI')
+            columns = {}
+            for _ in range(count):
+                name = reader.string()
+                kind = reader.unpack('c').decode()
+                reader.align()
+                present = self._view(reader.pos, rows)
+                reader.take(rows)
+                reader.align()
+                stored = rows if kind in KIND_INTS or kind == KIND_BOOL else bytes(present).count(1)
+                columns[name] = Column(self, kind, rows, present, reader.pos, stored)
+                reader.skip(kind, stored)
+            self._sections.append(Section(_type, rows, columns, manager))
+        del reader
+
+    @classmethod
+    def open(cls, path, manager):
+        with open(path, 'rb') as fp:
+            mapped = mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            archive = cls(mapped, manager)
+        except Exception:
+            mapped.close()
+            raise
+        archive._mmap = mapped
+        return archive
+
+    def _track(self, view):
+        self._views.append(view)
+        return view
+
+    def _view(self, start, size):
+        return self._track(self._buffer[start:start + size])
+
+    def close(self):
+        for view in reversed(self._views):
+            view.release()
+        self._buffer.release()
+        if self._mmap is not None:
+            self._mmap.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def get_entities(self, _type):
+        return EntityView(self, [section for section in self._sections if _type in section.components])
+
+    def get_entity(self, _type, _id):
+        return self.get_entities(_type).get(_id)
+
+    def iter_values(self, _type, name):
+        """Yields (pk, value) for the entities with component `_type` that have field `name` set."""
+        for section in self._sections:
+            if _type not in section.components or name not in section.fields:
+                continue
+            column = section.columns.get(section.fields[name].data_name)
+            if column is None:
+                continue
+            for pk, value in zip(section.pks(), column):
+                if value is not None:
+                    yield pk, value
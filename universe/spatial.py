@@ -0,0 +1,107 @@
+import heapq
+import math
+
+
+class GridIndex:
+    """A uniform grid over the positions of entities, for proximity queries.
+
+    Entities are bucketed by the cell containing their (x, y) coordinates, and are moved
+    between buckets as their coordinates change.
+    """
+
+    def __init__(self, cell_size):
+        self.cell_size = cell_size
+        self._cells = {}
+        self._entities = {}
+
+    def __len__(self):
+        return sum(len(bucket) for bucket in self._cells.values())
+
+    def __contains__(self, entity):
+        return entity.pk in self._entities
+
+    def _cell(self, x, y):
+        return math.floor(x / self.cell_size), math.floor(y / self.cell_size)
+
+    def _entity_cell(self, entity):
+        # Entities missing a coordinate, or with one that fails validation, stay tracked but are
+        # not in any cell until it is set again.
+        try:
+            return self._cell(entity.x, entity.y)
+        except TypeError:
+            return None
+
+    def _place(self, entity):
+        cell, pk = self._entity_cell(entity), entity.pk
+        if cell is not None:
+            self._cells.setdefault(cell, {})[pk] = entity
+        self._entities[pk] = cell
+
+    def _unplace(self, pk):
+        cell = self._entities.pop(pk, None)
+        if cell is None:
+            return
+        bucket = self._cells[cell]
+        del bucket[pk]
+        if not bucket:
+            del self._cells[cell]
+
+    def insert(self, entity):
+        self._unplace(entity.pk)
+        self._place(entity)
+
+    def remove(self, entity):
+        self._unplace(entity.pk)
+
+    def move(self, entity):
+        if entity.pk not in self._entities:
+            return
+        if self._entity_cell(entity) != self._entities[entity.pk]:
+            self._unplace(entity.pk)
+            self._place(entity)
+
+    def _scan(self, x_min, y_min, x_max, y_max):
+        (i_min, j_min), (i_max, j_max) = self._cell(x_min, y_min), self._cell(x_max, y_max)
+        if (i_max - i_min + 1) * (j_max - j_min + 1) > len(self._cells):
+            cells = (bucket for (i, j), bucket in self._cells.items()
+                     if i_min <= i <= i_max and j_min <= j <= j_max)
+        else:
+            cells = (self._cells[(i, j)] for i in range(i_min, i_max + 1) for j in range(j_min, j_max + 1)
+                     if (i, j) in self._cells)
+        for bucket in cells:
+            yield from bucket.items()
+
+    def in_rect(self, x_min, y_min, x_max, y_max):
+        return {pk: entity for pk, entity in self._scan(x_min, y_min, x_max, y_max)
+                if x_min <= entity.x <= x_max and y_min <= entity.y <= y_max}
+
+    def in_radius(self, x, y, radius):
+        return {pk: entity for pk, entity in self._scan(x - radius, y - radius, x + radius, y + radius)
+                if (entity.x - x) ** 2 + (entity.y - y) ** 2 <= radius ** 2}
+
+    def _ring(self, ci, cj, ring):
+        if ring == 0:
+            yield ci, cj
+            return
+        for i in range(ci - ring, ci + ring + 1):
+            yield i, cj - ring
+            yield i, cj + ring
+        for j in range(cj - ring + 1, cj + ring):
+            yield ci - ring, j
+            yield ci + ring, j
+
+    def nearest(self, x, y, k=1):
+        # Search outwards ring by ring.  Everything beyond ring r is at least r cells away from
+        # (x, y), so once the k-th closest candidate is that close the search can stop.
+        ci, cj = self._cell(x, y)
+        candidates, seen, ring = [], 0, 0
+        total = len(self)
+        while seen < total:
+            for cell in self._ring(ci, cj, ring):
+                for pk, entity in self._cells.get(cell, {}).items():
+                    candidates.append(((entity.x - x) ** 2 + (entity.y - y) ** 2, pk, entity))
+                    seen += 1
+            if len(candidates) >= k and heapq.nsmallest(k, candidates)[-1][0] <= (ring * self.cell_size) ** 2:
+                break
+            ring += 1
+        return [entity for distance, pk, entity in heapq.nsmallest(k, candidates)]
@@ -0,0 +1,195 @@
+from array import array
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+from . import fields
+
+
+# The states of a row of a Column: without a value, with one in the values, or with one aside.
+UNSET, STORED, ASIDE = 0, 1, 2
+
+INT64_MIN, INT64_MAX = -2 ** 63, 2 ** 63 - 1
+
+
+class SlotStorage:
+    """Stores the fields of each entity in the slots of its generated class.
+
+    Storage backends provide the storage of the field data for the entity classes generated by
+    the Manager, as objects with the interface of slot members: `__get__` raising
+    AttributeError for unset fields, `__set__` and `__delete__`.
+    """
+
+    def slots(self, data_names):
+        return data_names
+
+    def bind(self, entity_cls, _type, data_names):
+        return {name: entity_cls.__dict__[name] for name in data_names}
+
+    def iter_values(self, manager, _type, name):
+        for pk, entity in manager.get_entities(_type).items():
+            value = getattr(entity, name)
+            if value is not None:
+                yield pk, value
+
+    def arrays(self, manager, _type, name):
+        items = [(pk, value) for pk, value in self.iter_values(manager, _type, name)
+                 if type(value) is int and INT64_MIN <= value <= INT64_MAX]
+        pks, values = zip(*items) if items else ((), ())
+        return numpy.array(pks, dtype=numpy.int64), numpy.array(values, dtype=numpy.int64)
+
+
+class Column:
+    """The values of one field by row.
+
+    The values of integer fields are kept in an array of int64.  Values that do not fit, such as
+    the Decimal coordinates of moving ships during a turn or a population too large for int64,
+    are set aside in a dict by row, so that the array stays typed.  Other fields are kept in a list.
+    """
+
+    __slots__ = ('values', 'present', 'aside', 'typed')
+
+    def __init__(self, typed):
+        self.typed = typed
+        self.values = array('q') if typed else []
+        self.present = bytearray()
+        self.aside = {}
+
+    def append(self):
+        self.values.append(0 if self.typed else None)
+        self.present.append(UNSET)
+
+    def fits(self, value):
+        return not self.typed or type(value) is int and INT64_MIN <= value <= INT64_MAX
+
+
+class ColumnSlot:
+    """The storage of one field of the entities of a type, as one of the columns of its Table."""
+
+    __slots__ = ('name', 'column')
+
+    def __init__(self, name, column):
+        self.name = name
+        self.column = column
+
+    def __get__(self, instance, owner=None):
+        if instance is None:
+            return self
+        column, row = self.column, instance._row
+        state = column.present[row]
+        if state == STORED:
+            return column.values[row]
+        if state == ASIDE:
+            return column.aside[row]
+        raise AttributeError(self.name)
+
+    def __set__(self, instance, value):
+        column, row = self.column, instance._row
+        if column.present[row] == ASIDE:
+            del column.aside[row]
+        if column.fits(value):
+            column.values[row] = value
+            column.present[row] = STORED
+        else:
+            column.aside[row] = value
+            column.present[row] = ASIDE
+
+    def __delete__(self, instance):
+        column, row = self.column, instance._row
+        state = column.present[row]
+        if state == UNSET:
+            raise AttributeError(self.name)
+        if state == ASIDE:
+            del column.aside[row]
+        column.present[row] = UNSET
+
+
+class Table:
+    """The columns of the fields of the entities of one type, with a dense row per entity.
+
+    Rows are not reused: a Manager lasts for a single turn, so the rows of the entities removed
+    during it are only released along with the Manager.
+    """
+
+    def __init__(self, data_names, typed=()):
+        self.columns = {name: Column(name in typed) for name in data_names}
+        self.rows = 0
+
+    def allocate(self):
+        for column in self.columns.values():
+            column.append()
+        self.rows += 1
+        return self.rows - 1
+
+
+class ColumnStorage:
+    """Stores the fields of the entities of each type as columns of a Table.
+
+    Entities become views of a row of their type's table.  Columns can be read as a whole,
+    e.g. to sum the population of every planet, through `iter_values` or, with NumPy, `arrays`.
+    """
+
+    def __init__(self):
+        self.tables = {}
+
+    def slots(self, data_names):
+        return ('_row',)
+
+    def bind(self, entity_cls, _type, data_names):
+        # The pks are the keys of every registry and index of the Manager, so their column holds
+        # the int objects those share rather than creating a new one on every read.
+        typed = {name for name in data_names
+                 if isinstance(entity_cls._fields[name], (fields.IntField, fields.Reference))}
+        table = self.tables[_type] = Table(data_names, typed)
+        entity_cls._table = table
+
+        slots = {}
+        for name in data_names:
+            slots[name] = ColumnSlot(name, table.columns[name])
+            setattr(entity_cls, name, slots[name])
+        return slots
+
+    def _columns(self, manager, _type, name):
+        # The tables of the entity types with component `_type`, with their field for `name`.
+        registry = manager._entity_registry
+        for entity_type, table in self.tables.items():
+            if _type not in registry.get(entity_type, {}):
+                continue
+            field = manager.get_field_table(entity_type).get(name)
+            if field is not None:
+                yield table, field
+
+    def iter_values(self, manager, _type, name):
+        for table, field in self._columns(manager, _type, name):
+            pks, column = table.columns['pk'], table.columns[field.data_name]
+            convert = field.name == name
+            for row, (pk, has_pk, present) in enumerate(zip(pks.values, pks.present, column.present)):
+                if not has_pk or pk is None or not present:
+                    continue
+                value = column.values[row] if present == STORED else column.aside[row]
+                if value is not None:
+                    yield pk, field.from_value(value, manager) if convert else value
+
+    def arrays(self, manager, _type, name):
+        """(pks, values) as NumPy int64 arrays, for the entities with component `_type` and integer field `name`.
+
+        The values are the stored data, e.g. pks for references, and only those held in the int64
+        columns are included, not those set aside.
+        """
+        pks, values = [numpy.empty(0, dtype=numpy.int64)], [numpy.empty(0, dtype=numpy.int64)]
+        for table, field in self._columns(manager, _type, name):
+            pk_column, column = table.columns['pk'], table.columns[field.data_name]
+            if not column.typed:
+                raise TypeError(f"{field.data_name!r} is not an integer field.")
+            if not table.rows:
+                continue
+            pk_values = numpy.array(pk_column.values, dtype=object)
+            stored = ((numpy.frombuffer(pk_column.present, dtype=numpy.uint8) == STORED)
+                      & numpy.not_equal(pk_values, None)
+                      & (numpy.frombuffer(column.present, dtype=numpy.uint8) == STORED))
+            # Indexing copies, so that the arrays of the table can still grow.
+            pks.append(pk_values[stored].astype(numpy.int64))
+            values.append(numpy.frombuffer(column.values, dtype=numpy.int64)[stored])
+        return numpy.concatenate(pks), numpy.concatenate(values)
@@ -1,49 +1,102 @@
-from collections import defaultdict
 from decimal import Decimal
 
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
 from . import utils
 
 
 class UpdateSystem:
-    def process(self, manager):
-        queues = defaultdict(dict)
-        for order in manager.get_entities('orders').values():
-            queues[order.actor_id][order.seq] = order
-
-        for data in manager._updates:
-            action = data.pop('action')
+    """Applies the updates issued by the players to the queues of orders of their actors.
+
+    The updates are grouped by actor and replayed against a model of each queue, so that all
+    of the updates to an order are folded into a single write of each field, and orders both
+    created and deleted this turn are never registered.  The pks of the created orders are
+    allocated in the order of the updates creating them, as applying each update in turn would.
+    The update dicts themselves are left untouched.
+    """
+
+    # The keys each action needs in addition to 'actor_id': those finding the orders it applies
+    # to, and the type of the order for a create.
+    ACTIONS = {'create': ('seq', 'type'), 'reorder': ('seq1', 'seq2'), 'update': ('seq',), 'delete': ('seq',)}
+
+    def _replay(self, manager, actor_id, updates, created, written, deleted):
+        # The orders of the actor by seq, as changed by the updates so far.  Existing orders are
+        # entities, created ones the index of the update creating them, and None marks a seq
+        # that has been emptied.
+        queue = {}
+
+        def get(seq):
+            if type(seq) is not int:
+                return None
+            if seq in queue:
+                return queue[seq]
+            return manager.get_order(actor_id, seq)
+
+        def write(order, values):
+            (created[order] if type(order) is int else written.setdefault(order, {})).update(values)
+
+        for i, update in updates:
+            action = update['action']
             if action == 'create':
-                if data['actor_id'] in queues and data['seq'] in queues[data['actor_id']]:
+                if get(update['seq']) is not None:
                     continue
-                order = manager.register_entity(data)
-                queues[order.actor_id][order.seq] = order
+                created[i] = {k: v for k, v in update.items() if k != 'action'}
+                if type(update['seq']) is int:
+                    queue[update['seq']] = i
             elif action == 'reorder':
-                if data['actor_id'] not in queues:
-                    continue
-                if data['seq1'] not in queues[data['actor_id']]:
+                seq1, seq2 = update['seq1'], update['seq2']
+                order1, order2 = get(seq1), get(seq2)
+                if order1 is None or order2 is None:
                     continue
-                if data['seq2'] not in queues[data['actor_id']]:
-                    continue
-                order1 = queues[data['actor_id']].pop(data['seq1'], None)
-                order2 = queues[data['actor_id']].pop(data['seq2'], None)
-                order1.seq, order2.seq = order2.seq, order1.seq
-                queues[order1.actor_id][order1.seq] = order1
-                queues[order2.actor_id][order2.seq] = order2
+                write(order1, {'seq': seq2})
+                write(order2, {'seq': seq1})
+                queue[seq1], queue[seq2] = order2, order1
             elif action == 'update':
-                if data['actor_id'] not in queues:
-                    continue
-                if data['seq'] not in queues[data['actor_id']]:
+                order = get(update['seq'])
+                if order is None:
                     continue
-                order = queues[data['actor_id']][data['seq']]
-                for k, v in data.items():
-                    setattr(order, k, v)
+                # The order was found by its actor and seq, so writing them again would change nothing.
+                write(order, {k: v for k, v in update.items() if k not in ('action', 'actor_id', 'seq')})
             elif action == 'delete':
-                if data['actor_id'] not in queues:
-                    continue
-                if data['seq'] not in queues[data['actor_id']]:
+                order = get(update['seq'])
+                if order is None:
                     continue
-                manager.unregister_entity(queues[data['actor_id']][data['seq']])
-                del queues[data['actor_id']][data['seq']]
+                if type(order) is int:
+                    created[order] = None
+                else:
+                    written.pop(order, None)
+                    deleted.append(order)
+                queue[update['seq']] = None
+
+    def process(self, manager):
+        actors = {}
+        for i, update in enumerate(manager._updates):
+            actors.setdefault(update['actor_id'], []).append((i, update))
+
+        created, written, deleted = {}, {}, []
+        for actor_id, updates in actors.items():
+            self._replay(manager, actor_id, updates, created, written, deleted)
+
+        for order, values in written.items():
+            for name, value in values.items():
+                setattr(order, name, value)
+        for order in deleted:
+            manager.unregister_entity(order)
+
+        # Orders deleted in the same turn as they were created still use up a pk.
+        orders = []
+        for i in sorted(created):
+            data = created[i]
+            if data is not None and data.get('pk') is not None:
+                orders.append(data)
+                continue
+            pk, manager._seq = manager._seq, manager._seq + 1
+            if data is not None:
+                orders.append(dict(data, pk=pk))
+        manager.register_entities(orders)
 
 
 class MovementSystem:
@@ -95,35 +148,70 @@ class MovementSystem:
         else:
             move.actor.dx, move.actor.dy = speed * dx / D, speed * dy / D
 
-    def process(self, manager):
-        movements = defaultdict(list)
-        for move in manager.get_entities('movement_orders').values():
-            movements[move.actor_id].append(move)
+    def _move_directly(self, move):
+        # Closed form of the stepped integration towards a goal that does not move.  Each step
+        # covers `speed` along the straight line to the goal, until the first step at which the
+        # remaining distance rounds to no more than `speed` and the object snaps onto the goal.
+        speed = Decimal(move.warp ** 2) / self.N
+
+        if move.target is not None:
+            x_t, y_t = move.target.x, move.target.y
+        else:
+            x_t, y_t = move.x_t, move.y_t
 
-        movements = {_id: sorted(queue, key=lambda x: x.seq) for _id, queue in movements.items() if queue}
+        dx, dy = Decimal(x_t).to_integral_value() - move.actor.x, Decimal(y_t).to_integral_value() - move.actor.y
 
-        for _id, entity in manager.get_entities('position').items():
-            entity.x_prev, entity.y_prev = entity.x, entity.y
+        # The remaining distance only shrinks, so the goal is reached this turn iff it would be at the last step.
+        D = Decimal(dx ** 2 + dy ** 2).sqrt()
+        if (D - (self.N - 1) * speed).to_integral_value() <= speed:
+            move.actor.x, move.actor.y = move.actor.x + dx, move.actor.y + dy
+        else:
+            distance = self.N * speed
+            move.actor.x, move.actor.y = move.actor.x + distance * dx / D, move.actor.y + distance * dy / D
+
+    def _interceptions(self, movements):
+        # Objects chasing another moving object have to be integrated step by step, and so do the
+        # objects that they are chasing.  Everything else can be moved directly to its endpoint.
+        chasers = {_id for _id, move in movements.items() if move.target_id in movements}
+        return chasers | {movements[_id].target_id for _id in chasers}
 
-        for self.step in range(self.N):
-            for queue in movements.values():
-                self._vector_to_target(queue[0])
+    def _integrate(self, interceptions):
+        for self.step in range(self.N if interceptions else 0):
+            for move in interceptions:
+                self._vector_to_target(move)
 
-            for queue in movements.values():
-                self._vector_to_projection(queue[0])
+            for move in interceptions:
+                self._vector_to_projection(move)
 
-            for queue in movements.values():
-                entity = queue[0].actor
+            for move in interceptions:
+                entity = move.actor
                 dx, dy = entity.dx or Decimal(0), entity.dy or Decimal(0)
                 entity.x, entity.y = entity.x + dx, entity.y + dy
 
-        for queue in movements.values():
-            entity = queue[0].actor
+    def process(self, manager):
+        # Each actor carries out the first of its movement orders.
+        movements = {}
+        for _id, orders in manager.iter_order_queues():
+            move = next((order for order in orders if 'movement_orders' in order), None)
+            if move is not None:
+                movements[_id] = move
+
+        for _id, entity in manager.get_entities('position').items():
+            entity.x_prev, entity.y_prev = entity.x, entity.y
+
+        stepped = self._interceptions(movements)
+        for _id, move in movements.items():
+            if _id not in stepped:
+                self._move_directly(move)
+
+        self._integrate([move for _id, move in movements.items() if _id in stepped])
+
+        for move in movements.values():
+            entity = move.actor
             entity.x, entity.y = int(entity.x.to_integral_value()), int(entity.y.to_integral_value())
 
         # drop any waypoints that have been reached
-        for queue in movements.values():
-            move = queue[0]
+        for _id, move in movements.items():
             entity = move.actor
             x, y = entity.x, entity.y
             if move.target is not None:
@@ -133,55 +221,186 @@ class MovementSystem:
 
             if (x, y) == (x_t, y_t):
                 manager.unregister_entity(move)
-                queue.pop(0)
+                queue = [order for order in manager.get_orders(_id) if 'movement_orders' in order]
                 for i, order in enumerate(queue):
                     order.seq = i
 
 
+class VectorizedMovementSystem(MovementSystem):
+    """Integrates every interception at once over NumPy float64 arrays.
+
+    Wherever the Decimal integrator rounds to an integer, the float values are first rounded to
+    TOLERANCE decimal places, so that floating point noise around an exact tie rounds the same
+    way as the Decimal value.  The final integer positions match the Decimal integrator unless a
+    rounded value lands within 10 ** -TOLERANCE of a tie without being exactly on it.  Falls
+    back to the Decimal integrator if NumPy is not installed.
+    """
+
+    TOLERANCE = 6
+
+    def _round(self, values):
+        return numpy.rint(numpy.round(values, self.TOLERANCE))
+
+    def _velocity(self, dx, dy, speed):
+        D = numpy.sqrt(dx ** 2 + dy ** 2)
+        arrived = self._round(D) <= speed
+        with numpy.errstate(divide='ignore', invalid='ignore'):
+            return numpy.where(arrived, dx, speed * dx / D), numpy.where(arrived, dy, speed * dy / D)
+
+    def _integrate(self, interceptions):
+        if numpy is None or not interceptions:
+            return super()._integrate(interceptions)
+
+        moves = interceptions
+        actors = [move.actor for move in moves]
+        index = {actor.pk: i for i, actor in enumerate(actors)}
+
+        x = numpy.array([float(actor.x) for actor in actors])
+        y = numpy.array([float(actor.y) for actor in actors])
+        speed = numpy.array([move.warp ** 2 for move in moves], dtype=float) / self.N
+
+        # Goals are either fixed for the turn, or track the position of another intercepting actor.
+        target = numpy.array([index.get(move.target_id, -1) for move in moves])
+        tracking = target >= 0
+        goals = [(move.target.x, move.target.y) if move.target is not None else (move.x_t, move.y_t)
+                 for move in moves]
+        x_goal = numpy.array([float(goal[0]) for goal in goals])
+        y_goal = numpy.array([float(goal[1]) for goal in goals])
+
+        x_p, y_p = None, None
+        stable = numpy.ones(len(moves), dtype=bool)
+        for step in range(self.N):
+            # Vector to the (rounded) current position of the goal, as in _vector_to_target.
+            dx = self._round(numpy.where(tracking, x[target], x_goal)) - x
+            dy = self._round(numpy.where(tracking, y[target], y_goal)) - y
+            vx, vy = self._velocity(dx, dy, speed)
+
+            remaining = self.N - step
+            x_n, y_n = self._round(x + remaining * vx), self._round(y + remaining * vy)
+            if x_p is None:
+                x_p, y_p = x_n, y_n
+            stable &= (x_p == x_n) & (y_p == y_n)
+
+            # Redirect towards the projected endpoint of the goal if it is stable, as in _vector_to_projection.
+            chasing = tracking & stable[target]
+            px, py = self._velocity(x_p[target] - x, y_p[target] - y, speed)
+            vx, vy = numpy.where(chasing, px, vx), numpy.where(chasing, py, vy)
+
+            x += vx
+            y += vy
+
+        for i, actor in enumerate(actors):
+            actor.x = Decimal(f'{x[i]:.{self.TOLERANCE}f}')
+            actor.y = Decimal(f'{y[i]:.{self.TOLERANCE}f}')
+
+
 class MiningSystem:
+    """Mines every owned planet, in one batch per owning species.
+
+    All of the values involved are non-negative integers, so truncating the Decimal values of
+    utils.mining is the same as floor division, and the batches are exact.  Uses NumPy int64
+    arrays when NumPy is installed and the populations are small enough not to overflow them.
+    """
+
+    MAX_POPULATION = 2 ** 48
+
+    def _mine(self, species, planets):
+        population = [planet.population or 0 for planet in planets]
+        if numpy is None or max(population) >= self.MAX_POPULATION:
+            return [utils.fixed_mining(species, planet) for planet in planets]
+
+        population = numpy.array(population, dtype=numpy.int64)
+        mines = numpy.array([planet.mines or 0 for planet in planets], dtype=numpy.int64)
+        conc = numpy.array([(planet.ironium_conc, planet.boranium_conc, planet.germanium_conc) for planet in planets],
+                           dtype=numpy.int64)
+
+        can_operate = population // 10_000 * species.mines_per_pop
+        capacity = numpy.minimum(mines, can_operate) * species.minerals_per_m // 10
+        return (conc * capacity[:, None] // 100).tolist()
+
     def process(self, manager):
-        for _id, entity in manager.get_entities('mineral_concentrations').items():
-            species = manager.get_entity('species', entity.owner_id)
-            if species is None:
+        for species in manager.get_entities('species').values():
+            planets = list(manager.get_owned_entities(species.pk, 'mineral_concentrations').values())
+            if not planets:
                 continue
 
-            ir, bo, ge = utils.mining(species, entity)
-            entity.ironium = (entity.ironium or 0) + ir
-            entity.boranium = (entity.boranium or 0) + bo
-            entity.germanium = (entity.germanium or 0) + ge
+            for entity, (ir, bo, ge) in zip(planets, self._mine(species, planets)):
+                entity.ironium = (entity.ironium or 0) + ir
+                entity.boranium = (entity.boranium or 0) + bo
+                entity.germanium = (entity.germanium or 0) + ge
 
 
 class PopulationGrowthSystem:
+    """Grows the population of every owned planet, in one batch per owning species.
+
+    The planet values come from the habitability table of the species in one pass, and the growth
+    is computed over NumPy arrays: in int64 as in utils.fixed_population_growth, except between a
+    quarter and fully populated, where its terms outgrow int64 and float64 is used instead.
+    Planets without capacity, results practically on a tie and populations too large for int64
+    go through the growth function of the manager one by one, as does every planet if NumPy is
+    not installed.
+    """
+
+    MAX_POPULATION = 2 ** 36
+    # How close to a tie between two integers a float64 growth has to be to be computed exactly.
+    TIE_MARGIN = 1e-6
+
+    def _grow(self, manager, species, planets, growth):
+        table = manager.get_habitability_table(species)
+        population = [planet.population or 0 for planet in planets]
+        if numpy is None:
+            return [growth(value, species.growth_rate, table.planet_value(planet))
+                    for value, planet in zip(population, planets)]
+
+        large = numpy.array([value >= self.MAX_POPULATION for value in population])
+        population = numpy.array([0 if value >= self.MAX_POPULATION else value for value in population],
+                                 dtype=numpy.int64)
+        planet_value = table.planet_values(numpy.array([utils.environment(planet) for planet in planets],
+                                                       dtype=numpy.int64))
+        capacity = 10_000 * planet_value
+
+        red = planet_value < 0
+        habitable = capacity > 0
+        overcrowded = habitable & (population > 4 * capacity)
+        crowded = habitable & ~overcrowded & (population > capacity)
+        sparse = habitable & (4 * population <= capacity)
+        filling = numpy.flatnonzero(habitable & ~overcrowded & ~crowded & ~sparse)
+
+        # The growth as numerator / denominator, in the same terms as utils.fixed_population_growth.
+        numerator = numpy.select(
+            [red, overcrowded, crowded],
+            [100_000 * population * (1000 + planet_value), 10_000 * population * (10_000 - 12 * planet_value),
+             population * (10 ** 8 - 4 * (population - capacity))],
+            10_000 * population * (10_000 + species.growth_rate * planet_value),
+        )
+        quotient, remainder = numpy.divmod(numerator, 10 ** 8)
+        results = quotient + ((2 * remainder > 10 ** 8) | ((2 * remainder == 10 ** 8) & (quotient % 2 == 1)))
+        # Over capacity, the Decimal value is rounded before it is exact only on an exact tie.
+        batched = red | overcrowded | sparse | crowded & (2 * remainder != 10 ** 8)
+
+        # population * growth_rate * planet_value / 10_000 * 16 * (1 - ratio) ** 2 / 9 is within a
+        # few ulps of its exact value in float64, and so rounds the same unless practically on a tie.
+        filled, vacant = population[filling], (capacity[filling] - population[filling]).astype(numpy.float64)
+        increase = (filled * (16.0 * species.growth_rate) * planet_value[filling] * vacant ** 2
+                    / (90_000.0 * capacity[filling].astype(numpy.float64) ** 2))
+        results[filling] = filled + numpy.floor(increase + 0.5).astype(numpy.int64)
+        batched[filling] = numpy.abs(increase - numpy.floor(increase) - 0.5) > self.TIE_MARGIN
+
+        results = results.tolist()
+        for i in numpy.flatnonzero(~batched | large):
+            results[i] = growth(planets[i].population or 0, species.growth_rate, int(planet_value[i]))
+        return results
+
     def process(self, manager):
-        for _id, entity in manager.get_entities('population').items():
-            if entity.type == 'ship':
-                continue
-            species = manager.get_entity('species', entity.owner_id)
-            if species is None:
+        growth = utils.fixed_population_growth if manager.fixed_point else utils.population_growth
+        for species in manager.get_entities('species').values():
+            planets = [entity for entity in manager.get_owned_entities(species.pk, 'population').values()
+                       if entity.type != 'ship']
+            if not planets:
                 continue
 
-            population = entity.population or 0
-            growth_rate = Decimal(species.growth_rate) / 100
-            habitability = Decimal(utils.planet_value(species, entity)) / 100
-            capacity = 1_000_000 * habitability
-
-            crowding, ratio = 1, 1
-            if habitability >= 0:
-                ratio = population / capacity
-                if ratio > 4:
-                    growth_rate = Decimal('-0.12')
-                elif ratio > 1:
-                    growth_rate = Decimal('-0.04') * (ratio - 1)
-                elif ratio > 0.25:
-                    crowding = 16 * (1 - ratio) ** 2 / 9
-            else:
-                # For red planets, you always lose 1/10 of the negative hab rating,
-                # e.g. -45% is -4.5% per year.  See:
-                # https://starsautohost.org/sahforum2/index.php?t=msg&th=5565&rid=0#msg_62828
-                growth_rate = Decimal('0.10')
-
-            population *= 1 + growth_rate * habitability * crowding
-            entity.population = int(population.to_integral_value())
-            if entity.population <= 0:
-                del entity.population
-                del entity.owner_id
+            for entity, population in zip(planets, self._grow(manager, species, planets, growth)):
+                entity.population = population
+                if entity.population <= 0:
+                    del entity.population
+                    del entity.owner_id
@@ -1,18 +1,39 @@
 from decimal import Decimal
+from fractions import Fraction
+import functools
 import math
+import operator
 
+try:
+    import numpy
+except ImportError:
+    numpy = None
 
-def planet_value(species, planet):
+
+ENVIRONMENTS = ('gravity', 'temperature', 'radiation')
+
+# Big enough to hold every owned planet of a large galaxy across turns.
+PLANET_VALUE_CACHE_SIZE = 2 ** 15
+
+
+# The immunity and habitable range of a species for each environment, flattened.
+environment_ranges = operator.attrgetter(
+    *(f'{env}_{attr}' for env in ENVIRONMENTS for attr in ('immune', 'min', 'max')))
+environment = operator.attrgetter(*ENVIRONMENTS)
+
+
+def _planet_value(ranges, values):
     # Algorithm taken from https://starsautohost.org/sahforum2/index.php?t=rview&th=2299&rid=0
 
     value, red, ideal = 0, 0, 10000
-    for env in ('gravity', 'temperature', 'radiation'):
-        if getattr(species, f'{env}_immune'):
+    for i, env_value in enumerate(values):
+        immune, env_min, env_max = ranges[3 * i:3 * i + 3]
+        if immune:
             value += 10000
         else:
-            radius = (getattr(species, f'{env}_max') - getattr(species, f'{env}_min')) // 2
-            center = (getattr(species, f'{env}_min') + getattr(species, f'{env}_max')) // 2
-            delta = abs(center - getattr(planet, env))
+            radius = (env_max - env_min) // 2
+            center = (env_min + env_max) // 2
+            delta = abs(center - env_value)
 
             if delta <= radius:  # rating is in the green
                 value += (100 - 100 * delta // radius) ** 2
@@ -28,6 +49,109 @@ def planet_value(species, planet):
     return int(int(math.sqrt(value / 3) + 0.9) * ideal / 10000)
 
 
+_cached_planet_value = functools.lru_cache(maxsize=PLANET_VALUE_CACHE_SIZE)(_planet_value)
+
+
+def planet_value(species, planet):
+    return _planet_value(environment_ranges(species), environment(planet))
+
+
+def cached_planet_value(species, planet):
+    """planet_value, memoized on the environment ranges of the species and the environment of the planet.
+
+    The key holds the values themselves rather than the species, so changes to species data
+    cannot produce stale results; use `cached_planet_value.cache_clear()` to release memory.
+    Hit and miss counts are available from `cached_planet_value.cache_info()`.
+    """
+    return _cached_planet_value(environment_ranges(species), environment(planet))
+
+
+cached_planet_value.cache_info = _cached_planet_value.cache_info
+cached_planet_value.cache_clear = _cached_planet_value.cache_clear
+
+
+# int(math.sqrt(value / 3) + 0.9) for every possible sum of the three per-environment values.
+_ROOT_TERMS = [int(math.sqrt(value / 3) + 0.9) for value in range(3 * 10000 + 1)]
+_ROOT_TERM_ARRAY = numpy.array(_ROOT_TERMS, dtype=numpy.int64) if numpy is not None else None
+
+
+class HabitabilityTable:
+    """The terms of planet_value for one species, tabulated over every environment value.
+
+    Each environment contributes independently to the value, the red (lethality) rating and
+    the ideal factor, so for each environment the table holds one (value, red, numerator,
+    denominator) entry per value from 0 to 100.  The ideal factors are applied in the same
+    order and with the same flooring as planet_value.
+    """
+
+    def __init__(self, ranges):
+        self.ranges = ranges
+        self.axes = tuple(self._axis(*ranges[3 * i:3 * i + 3]) for i in range(len(ENVIRONMENTS)))
+        self._arrays = None
+
+    @classmethod
+    def from_species(cls, species):
+        return cls(environment_ranges(species))
+
+    @staticmethod
+    def _axis(immune, env_min, env_max):
+        if immune:
+            return [(10000, 0, 1, 1)] * 101
+
+        entries = []
+        radius = (env_max - env_min) // 2
+        center = (env_min + env_max) // 2
+        for env_value in range(101):
+            delta = abs(center - env_value)
+            if delta == radius == 0:  # a degenerate range, which planet_value cannot rate either
+                entries.append(None)
+            elif delta <= radius:
+                margin = 2 * delta - radius
+                num, den = (radius * 2 - margin, radius * 2) if margin > 0 else (1, 1)
+                entries.append(((100 - 100 * delta // radius) ** 2, 0, num, den))
+            else:
+                entries.append((0, min(delta - radius, 15), 1, 1))
+        return entries
+
+    def planet_value(self, planet):
+        gravity, temperature, radiation = values = environment(planet)
+        e0, e1, e2 = self.axes[0][gravity], self.axes[1][temperature], self.axes[2][radiation]
+        if e0 is None or e1 is None or e2 is None:
+            return _planet_value(self.ranges, values)
+
+        red = e0[1] + e1[1] + e2[1]
+        if red != 0:
+            return -red
+        ideal = 10000 * e0[2] // e0[3] * e1[2] // e1[3] * e2[2] // e2[3]
+        return int(_ROOT_TERMS[e0[0] + e1[0] + e2[0]] * ideal / 10000)
+
+    @property
+    def arrays(self):
+        # The axes as NumPy arrays of shape (101, 4), with degenerate entries marked separately.
+        if self._arrays is None:
+            self._arrays = [(numpy.array([entry or (0, 0, 1, 1) for entry in axis], dtype=numpy.int64),
+                             numpy.array([entry is None for entry in axis]))
+                            for axis in self.axes]
+        return self._arrays
+
+    def planet_values(self, environments):
+        """planet_value for each row of an (n, 3) NumPy array of gravity, temperature and radiation."""
+        n = len(environments)
+        value, red = numpy.zeros(n, dtype=numpy.int64), numpy.zeros(n, dtype=numpy.int64)
+        ideal, degenerate = numpy.full(n, 10000, dtype=numpy.int64), numpy.zeros(n, dtype=bool)
+        for (entries, missing), column in zip(self.arrays, environments.T):
+            value += entries[column, 0]
+            red += entries[column, 1]
+            ideal = ideal * entries[column, 2] // entries[column, 3]
+            degenerate |= missing[column]
+
+        # The products are below 10 ** 6, so truncating them divided by 10000 is floor division.
+        values = numpy.where(red != 0, -red, _ROOT_TERM_ARRAY[value] * ideal // 10000)
+        for i in numpy.flatnonzero(degenerate):
+            values[i] = _planet_value(self.ranges, tuple(environments[i].tolist()))
+        return values
+
+
 def production(species, planet):
     population = Decimal(planet.population or 0)
 
@@ -46,3 +170,125 @@ def mining(species, planet):
     ga = Decimal(planet.germanium_conc) / 100
 
     return (int(ir * capacity), int(bo * capacity), int(ga * capacity))
+
+
+def population_growth(population, growth_rate, planet_value):
+    population = population or 0
+    growth_rate = Decimal(growth_rate) / 100
+    habitability = Decimal(planet_value) / 100
+    capacity = 1_000_000 * habitability
+
+    crowding, ratio = 1, 1
+    if habitability >= 0:
+        ratio = population / capacity
+        if ratio > 4:
+            growth_rate = Decimal('-0.12')
+        elif ratio > 1:
+            growth_rate = Decimal('-0.04') * (ratio - 1)
+        elif ratio > 0.25:
+            crowding = 16 * (1 - ratio) ** 2 / 9
+    else:
+        # For red planets, you always lose 1/10 of the negative hab rating,
+        # e.g. -45% is -4.5% per year.  See:
+        # https://starsautohost.org/sahforum2/index.php?t=msg&th=5565&rid=0#msg_62828
+        growth_rate = Decimal('0.10')
+
+    population *= 1 + growth_rate * habitability * crowding
+    return int(population.to_integral_value())
+
+
+# Integer implementations of population_growth and mining, producing exactly the same results.
+
+def _round_half_even(numerator, denominator):
+    quotient, remainder = divmod(numerator, denominator)
+    return quotient + (2 * remainder > denominator or (2 * remainder == denominator and quotient % 2))
+
+
+def _round_significant(value, precision=28):
+    # What the decimal module does to an inexact result in the default context: round half
+    # even to `precision` significant digits.
+    if value == 0:
+        return value
+    exponent = len(str(abs(value.numerator))) - len(str(value.denominator)) - precision
+    while True:
+        scaled = abs(value) / Fraction(10) ** exponent
+        quotient, remainder = divmod(scaled.numerator, scaled.denominator)
+        if quotient >= 10 ** precision:
+            exponent += 1
+        elif quotient < 10 ** (precision - 1):
+            exponent -= 1
+        else:
+            break
+    quotient = _round_half_even(scaled.numerator, scaled.denominator)
+    return (1 if value > 0 else -1) * quotient * Fraction(10) ** exponent
+
+
+def _replay_population_growth(population, growth_rate, planet_value):
+    # population_growth step by step, rounding every intermediate result the way the decimal
+    # module does.  Integer powers are computed by libmpdec with three extra digits of working
+    # precision and then rounded again, so (1 - ratio) ** 2 is rounded twice.
+    R = _round_significant
+    growth_rate, habitability = Fraction(growth_rate, 100), Fraction(planet_value, 100)
+
+    crowding = 1
+    if habitability >= 0:
+        ratio = R(Fraction(population) / (1_000_000 * habitability))
+        if ratio > 4:
+            growth_rate = Fraction(-12, 100)
+        elif ratio > 1:
+            growth_rate = R(Fraction(-4, 100) * R(ratio - 1))
+        elif ratio > Fraction(1, 4):
+            crowding = R(R(16 * R(R(R(1 - ratio) ** 2, 31))) / 9)
+    else:
+        growth_rate = Fraction(10, 100)
+
+    population = R(population * R(1 + R(R(growth_rate * habitability) * crowding)))
+    return _round_half_even(population.numerator, population.denominator)
+
+
+def fixed_population_growth(population, growth_rate, planet_value):
+    """population_growth in integer arithmetic, with exactly the same results.
+
+    Each case of the growth formula is computed as an exact fraction of integers.  The Decimal
+    implementation rounds some of its intermediate results, which can only matter when the exact
+    result is practically on a tie between two integers; those rare cases are replayed with the
+    rounding of the decimal module reproduced exactly.
+    """
+    population = population or 0
+    if planet_value < 0:
+        return _round_half_even(population * (1000 + planet_value), 1000)
+
+    capacity = 10_000 * planet_value
+    if capacity == 0 or population >= 10 ** 20:
+        # Division by zero, or intermediate results too large for the fast path to be exact.
+        return _replay_population_growth(population, growth_rate, planet_value)
+
+    if population > 4 * capacity:
+        return _round_half_even(population * (10_000 - 12 * planet_value), 10_000)
+    if 4 * population <= capacity:
+        return _round_half_even(population * (10_000 + growth_rate * planet_value), 10_000)
+
+    if population > capacity:
+        # -0.04 * (ratio - 1) * habitability == -4 * (population - capacity) / 10**8
+        numerator, denominator = population * (10 ** 8 - 4 * (population - capacity)), 10 ** 8
+    else:
+        # growth_rate * habitability * 16 * (1 - ratio)**2 / 9, over a common denominator
+        denominator = 90_000 * capacity ** 2
+        numerator = population * (denominator + 16 * growth_rate * planet_value * (capacity - population) ** 2)
+
+    quotient, remainder = divmod(numerator, denominator)
+    if abs(2 * remainder - denominator) * 10 ** 20 <= 2 * denominator * (population + 1):
+        return _replay_population_growth(population, growth_rate, planet_value)
+    return quotient + (2 * remainder > denominator)
+
+
+def fixed_mining(species, planet):
+    population = planet.population or 0
+    mines = planet.mines or 0
+    can_operate = population // 10_000 * species.mines_per_pop
+
+    capacity = min(mines, can_operate) * species.minerals_per_m // 10
+
+    return (planet.ironium_conc * capacity // 100,
+            planet.boranium_conc * capacity // 100,
+            planet.germanium_conc * capacity // 100)